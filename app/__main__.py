@@ -1,9 +1,29 @@
+import os
+import shutil
+import tempfile
+
 import uvicorn
 
 from app.core.settings import settings
 from app.gunicorn_runner import GunicornApplication
 
 
+def prepare_metrics_dir() -> None:
+    """
+    Set up the directory shared by the metrics of gunicorn workers.
+
+    prometheus_client reads PROMETHEUS_MULTIPROC_DIR when it is imported,
+    so this runs before the workers load the application.
+    """
+    path = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR",
+        os.path.join(tempfile.gettempdir(), "vimo_metrics"),
+    )
+    # Files of a previous run would be aggregated as well
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
 def main() -> None:
     """Entrypoint of the application."""
     if settings.RELOAD:
@@ -20,6 +40,7 @@ def main() -> None:
         # We choose gunicorn only if reload
         # option is not used, because reload
         # feature doesn't work with gunicorn workers.
+        prepare_metrics_dir()
         GunicornApplication(
             "app.web.application:get_app",
             host=settings.HOST,
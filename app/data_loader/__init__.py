@@ -1,20 +1,20 @@
 from io import BytesIO
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
-import requests
+import httpx
 from fastapi import UploadFile
 from loguru import logger
 
+from app.core.settings import settings
 from app.data_loader.docx_parser import read_docx_file
 from app.data_loader.md_parser import read_md_file
 from app.data_loader.pdf_parser import read_pdf_file
 from app.data_loader.pptx_parser import read_pptx_file
 from app.data_loader.xlsx_parser import read_xlsx_file
+from app.utils.http_client import get_http_client
 
-DEEPDOCS_API_URL = "https://3d4f-113-190-253-97.ngrok-free.app/api/parser/upload"
 
-
-def call_deepdocs_api(file: UploadFile, file_extension: str) -> Dict[str, Any]:
+async def call_deepdocs_api(file: UploadFile, file_extension: str) -> Dict[str, Any]:
     """Gửi tài liệu đến API DeepDocs và nhận kết quả."""
 
     # Xác định parser_type dựa trên định dạng file
@@ -31,8 +31,8 @@ def call_deepdocs_api(file: UploadFile, file_extension: str) -> Dict[str, Any]:
     files = {"file": (file.filename, BytesIO(file_content), file.content_type)}
 
     try:
-        response = requests.post(
-            DEEPDOCS_API_URL,
+        response = await get_http_client(settings.DEEPDOCS_API_URL).post(
+            settings.DEEPDOCS_API_URL,
             headers=headers,
             data=data,
             files=files,
@@ -53,19 +53,19 @@ def call_deepdocs_api(file: UploadFile, file_extension: str) -> Dict[str, Any]:
             logger.error("Failed to parse JSON from DeepDocs API response")
             return {"sections": [], "tables": []}
 
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"DeepDocs API request failed: {e}")
         return {"sections": [], "tables": []}
 
 
-def read_document(file: UploadFile) -> str:
+async def read_document(file: UploadFile) -> Tuple[List[str], List[str]]:
     file_type = file.filename.split(".")[-1].lower()
-    response_data = call_deepdocs_api(file, file_type)
+    response_data = await call_deepdocs_api(file, file_type)
 
     # Kiểm tra nếu response_data không phải dictionary
     if not isinstance(response_data, dict):
         logger.error("DeepDocs API response is not a valid dictionary")
-        return {"sections": [], "tables": []}
+        return [], []
 
     if file_type == "pdf":
         sections, tables = read_pdf_file(response_data)
@@ -0,0 +1,16 @@
+from app.db.collection_migrations.base import CollectionIndex, Migration
+from app.db.collection_migrations.runner import (
+    create_migration_table,
+    migrate_all,
+    migrate_collection,
+)
+from app.db.collection_migrations.versions import COLLECTION_MIGRATIONS
+
+__all__ = [
+    "COLLECTION_MIGRATIONS",
+    "CollectionIndex",
+    "Migration",
+    "create_migration_table",
+    "migrate_all",
+    "migrate_collection",
+]
@@ -0,0 +1,17 @@
+import asyncio
+
+from app.db.collection_migrations.runner import migrate_all
+from app.db.utils import _bootstrap_db, async_engine
+
+
+async def main() -> None:
+    """Apply pending collection migrations, e.g. ahead of a deploy."""
+    await _bootstrap_db()
+    try:
+        await migrate_all(async_engine)
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,30 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class CollectionIndex(BaseModel):
+    """Index of a collection table, named idx_<collection>_<name>."""
+
+    name: str
+    expression: str
+    using: str = "btree"
+
+    def index_name(self, table_name: str) -> str:
+        return f"idx_{table_name}_{self.name}"
+
+
+class Migration(BaseModel):
+    """
+    Versioned change of a collection table.
+
+    Statements run in one transaction, {table} is replaced by the qualified
+    table name. Indexes are then built concurrently, outside a transaction,
+    so the table stays writable. A migration is recorded once all its steps
+    succeeded, statements must therefore be safe to run again.
+    """
+
+    version: int
+    description: str
+    statements: List[str] = []
+    indexes: List[CollectionIndex] = []
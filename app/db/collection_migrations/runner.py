@@ -0,0 +1,216 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+
+from loguru import logger
+from sqlalchemy import DateTime, Integer, String, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.settings import settings
+from app.db.base import Base
+from app.db.collection_migrations.base import CollectionIndex, Migration
+from app.db.collection_migrations.versions import COLLECTION_MIGRATIONS
+from app.db.partitions import LIST_PARTITIONS_SQL
+
+TABLE_KIND_SQL = "SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"
+
+INDEX_IS_VALID_SQL = """
+SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)
+"""
+
+# Tables whose index is attached to the given partitioned index
+ATTACHED_PARTITIONS_SQL = """
+SELECT t.relname
+FROM pg_inherits i
+JOIN pg_index x ON x.indexrelid = i.inhrelid
+JOIN pg_class t ON t.oid = x.indrelid
+WHERE i.inhparent = to_regclass(:name)
+"""
+
+
+class AppliedMigration(Base):
+    """Migration versions applied to each collection."""
+
+    __tablename__ = "collection_migrations"
+
+    collection_name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    description: Mapped[str] = mapped_column(String, nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+
+async def create_migration_table(engine: AsyncEngine) -> None:
+    """Create the table of applied migrations if it does not exist yet."""
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[AppliedMigration.__table__],
+        )
+
+
+async def migrate_collection(engine: AsyncEngine, collection_name: str) -> List[int]:
+    """
+    Apply the pending migrations of a collection, return the applied versions.
+
+    Safe while serving: indexes are built with CREATE INDEX CONCURRENTLY,
+    which does not block writes. A collection is migrated by one worker at a
+    time, the others skip it instead of waiting on the lock, as a waiting
+    session would in turn hold up the concurrent build.
+    """
+    migrations = COLLECTION_MIGRATIONS.get(collection_name, [])
+    if not migrations:
+        return []
+
+    table = f"{settings.DB_VECTOR_SCHEMA}.{collection_name}"
+    lock_name = f"migrations:{collection_name}"
+    applied_now = []
+    async with engine.connect() as connection:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        conn = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        if await conn.scalar(text(TABLE_KIND_SQL), {"name": table}) is None:
+            # Migrated when the collection gets created
+            return []
+        locked = await conn.scalar(
+            text("SELECT pg_try_advisory_lock(hashtext(:name))"),
+            {"name": lock_name},
+        )
+        if not locked:
+            logger.info(f"{collection_name} is being migrated by another worker")
+            return []
+        try:
+            applied = await _applied_versions(conn, collection_name)
+            for migration in sorted(migrations, key=lambda m: m.version):
+                if migration.version in applied:
+                    continue
+                logger.info(
+                    f"Migrating {collection_name} to version {migration.version}: "
+                    f"{migration.description}",
+                )
+                await _apply(engine, conn, collection_name, migration)
+                applied_now.append(migration.version)
+        finally:
+            await conn.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:name))"),
+                {"name": lock_name},
+            )
+    return applied_now
+
+
+async def migrate_all(engine: AsyncEngine) -> None:
+    """Migrate every collection that has migrations, one after the other."""
+    await create_migration_table(engine)
+    for collection_name in COLLECTION_MIGRATIONS:
+        try:
+            await migrate_collection(engine, collection_name)
+        except Exception as e:
+            logger.exception(f"Migrating {collection_name} failed: {e}")
+
+
+async def _applied_versions(conn: AsyncConnection, collection_name: str) -> Set[int]:
+    result = await conn.execute(
+        select(AppliedMigration.version).where(
+            AppliedMigration.collection_name == collection_name,
+        ),
+    )
+    return set(result.scalars())
+
+
+async def _apply(
+    engine: AsyncEngine,
+    conn: AsyncConnection,
+    collection_name: str,
+    migration: Migration,
+) -> None:
+    table = f"{settings.DB_VECTOR_SCHEMA}.{collection_name}"
+    if migration.statements:
+        async with engine.begin() as tx:
+            for statement in migration.statements:
+                await tx.execute(text(statement.format(table=table)))
+    for index in migration.indexes:
+        await _create_index(conn, collection_name, index)
+    await conn.execute(
+        insert(AppliedMigration)
+        .values(
+            collection_name=collection_name,
+            version=migration.version,
+            description=migration.description,
+        )
+        .on_conflict_do_nothing(),
+    )
+
+
+async def _create_index(
+    conn: AsyncConnection,
+    collection_name: str,
+    index: CollectionIndex,
+) -> None:
+    schema = settings.DB_VECTOR_SCHEMA
+    name = index.index_name(collection_name)
+    kind = await conn.scalar(
+        text(TABLE_KIND_SQL),
+        {"name": f"{schema}.{collection_name}"},
+    )
+    if kind != "p":
+        await _create_index_concurrently(conn, collection_name, name, index)
+        return
+
+    # Partitioned tables do not support CONCURRENTLY: the parent index is
+    # created on the parent only, then each partition's index is built
+    # concurrently and attached. The parent index is valid once all are.
+    await conn.execute(
+        text(
+            f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {schema}.{collection_name} "
+            f"USING {index.using} ({index.expression})",
+        ),
+    )
+    result = await conn.execute(
+        text(LIST_PARTITIONS_SQL),
+        {"schema": schema, "table_name": collection_name},
+    )
+    partitions = [row[0] for row in result.fetchall()]
+    result = await conn.execute(
+        text(ATTACHED_PARTITIONS_SQL),
+        {"name": f"{schema}.{name}"},
+    )
+    # Partitions created after the parent index got theirs automatically
+    attached = {row[0] for row in result.fetchall()}
+    for partition in partitions:
+        if partition in attached:
+            continue
+        partition_index = f"{partition}_{index.name}"
+        await _create_index_concurrently(conn, partition, partition_index, index)
+        await conn.execute(
+            text(
+                f"ALTER INDEX {schema}.{name} "
+                f"ATTACH PARTITION {schema}.{partition_index}",
+            ),
+        )
+
+
+async def _create_index_concurrently(
+    conn: AsyncConnection,
+    table_name: str,
+    name: str,
+    index: CollectionIndex,
+) -> None:
+    schema = settings.DB_VECTOR_SCHEMA
+    valid: Optional[bool] = await conn.scalar(
+        text(INDEX_IS_VALID_SQL),
+        {"name": f"{schema}.{name}"},
+    )
+    if valid is False:
+        # Left behind by an interrupted concurrent build
+        logger.warning(f"Rebuilding invalid index {name}")
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{name}"))
+    await conn.execute(
+        text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+            f"ON {schema}.{table_name} USING {index.using} ({index.expression})",
+        ),
+    )
+    logger.info(f"Index {name} is in place")
@@ -0,0 +1,57 @@
+from typing import Dict, List
+
+from app.db.collection_migrations.base import CollectionIndex, Migration
+
+# Migrations of each collection, append new versions and never edit applied
+# ones. The first versions match the indexes created before migrations
+# existed, so existing databases only record them.
+COLLECTION_MIGRATIONS: Dict[str, List[Migration]] = {
+    "vimo_documents": [
+        Migration(
+            version=1,
+            description="Full-text indexes of content and title",
+            indexes=[
+                CollectionIndex(
+                    name="content_tsv",
+                    using="gin",
+                    expression="to_tsvector('english', payload->>'content')",
+                ),
+                CollectionIndex(
+                    name="title_tsv",
+                    using="gin",
+                    expression="to_tsvector('english', payload->>'title')",
+                ),
+            ],
+        ),
+        Migration(
+            version=2,
+            description="HNSW index for cosine similarity search",
+            indexes=[
+                CollectionIndex(
+                    name="embedding_hnsw",
+                    using="hnsw",
+                    expression="embedding vector_cosine_ops",
+                ),
+            ],
+        ),
+        Migration(
+            version=3,
+            description="Source index for per-document deletes and filters",
+            indexes=[
+                CollectionIndex(name="source", expression="(payload->'source')"),
+            ],
+        ),
+    ],
+    "vimo_chat_history": [
+        Migration(
+            version=1,
+            description="Session lookup index",
+            indexes=[
+                CollectionIndex(
+                    name="session_id",
+                    expression="(payload->'session_id')",
+                ),
+            ],
+        ),
+    ],
+}
@@ -1,14 +1,27 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
 from fastapi import Depends
 from loguru import logger
+from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
 from app.core.settings import settings
 from app.db.base import Base
-from app.db.keyword_index import create_keyword_index_if_not_exists
+from app.db.collection_migrations import migrate_collection
 from app.db.models import PgVectorCollection
-from app.db.utils import async_engine, session_factory
+from app.db.partitions import (
+    PartitionSpec,
+    create_key_partitions,
+    ensure_time_partitions,
+    get_partition_specs,
+)
+from app.db.registry import collection_registry
+from app.db.utils import (
+    async_engine,
+    read_engine,
+    read_session_factory,
+    session_factory,
+)
 
 
 class PgVectorClient:
@@ -16,46 +29,96 @@ class PgVectorClient:
         self,
         engine: AsyncEngine,
         session_maker: async_sessionmaker[AsyncSession],
+        read_engine: Optional[AsyncEngine] = None,
+        read_session_maker: Optional[async_sessionmaker[AsyncSession]] = None,
     ) -> None:
         self.engine = engine
         self.session_maker = session_maker
+        # Collection reads, the primary when no replica is configured
+        self.read_engine = read_engine or engine
+        self.read_session_maker = read_session_maker or session_maker
         self._metadata = Base.metadata
-
-    async def setup(self) -> None:
-        await self.sync()
-        await create_keyword_index_if_not_exists("vimo_documents")
+        self._registry = collection_registry
 
     async def sync(self) -> None:
+        """Reflect the vector schema once per process, called on startup."""
+        async with self._registry.lock:
+            await self._reflect()
+            self._registry.loaded = True
+
+    async def _reflect(self, table_name: Optional[str] = None) -> None:
         async with self.engine.begin() as conn:
-            await conn.run_sync(self._metadata.reflect)
+            try:
+                await conn.run_sync(
+                    self._metadata.reflect,
+                    only=[table_name] if table_name else None,
+                )
+            except InvalidRequestError:
+                # The table does not exist
+                return
+        self._registry.partitions = await get_partition_specs(self.engine)
 
     async def create_collection(
         self,
         collection_name: str,
         dimension: int,
+        partition_by: Optional[PartitionSpec] = None,
     ) -> PgVectorCollection:
         try:
             logger.info(f"Creating collection {collection_name}...")
             collection = PgVectorCollection(
                 collection_name=collection_name,
                 dimension=dimension,
+                partition_by=partition_by,
                 session_maker=self.session_maker,
+                read_session_maker=self.read_session_maker,
             )
-            collection.build_table()
+            # Accessing the table maps it into the metadata
+            collection.table  # noqa: B018
             async with self.engine.begin() as conn:
                 await conn.run_sync(self._metadata.create_all)
+            if partition_by is not None and partition_by.strategy == "range":
+                await ensure_time_partitions(
+                    self.engine,
+                    collection_name,
+                    settings.PARTITION_PREMAKE_DAYS,
+                )
+            elif partition_by is not None:
+                await create_key_partitions(
+                    self.engine,
+                    collection_name,
+                    partition_by,
+                )
+            if partition_by is not None:
+                self._registry.partitions[collection_name] = partition_by
+            # Indexes of an empty table are built right away
+            await migrate_collection(self.engine, collection_name)
+            self._registry.add(collection)
             return collection
         except Exception as e:
             logger.error(f"Error creating collection: {e}")
             raise e
 
     async def get_collection(self, collection_name: str) -> PgVectorCollection:
+        collection = self._registry.get(collection_name)
+        if collection is not None:
+            return collection
         try:
-            logger.info(f"Getting collection {collection_name}...")
-            await self.sync()
-            if self.__is_collection_exists(collection_name):
-                return self.__construct_collection(collection_name)
-            raise ValueError(f"Collection {collection_name} does not exist")
+            async with self._registry.lock:
+                if not self._registry.loaded:
+                    await self._reflect()
+                    self._registry.loaded = True
+                elif not self.__is_collection_exists(collection_name):
+                    # Possibly created by another worker since startup
+                    logger.info(f"Reflecting collection {collection_name}...")
+                    await self._reflect(collection_name)
+                if not self.__is_collection_exists(collection_name):
+                    raise ValueError(f"Collection {collection_name} does not exist")
+                collection = self._registry.get(
+                    collection_name,
+                ) or self.__construct_collection(collection_name)
+                self._registry.add(collection)
+                return collection
         except Exception as e:
             logger.error(f"Error getting collection: {e}")
             raise e
@@ -64,11 +127,16 @@ class PgVectorClient:
         self,
         collection_name: str,
         dimension: int,
+        partition_by: Optional[PartitionSpec] = None,
     ) -> PgVectorCollection:
         try:
             return await self.get_collection(collection_name)
         except Exception:
-            return await self.create_collection(collection_name, dimension)
+            return await self.create_collection(
+                collection_name,
+                dimension,
+                partition_by,
+            )
 
     def __construct_collection(self, collection_name: str) -> PgVectorCollection:
         collection_uri = f"{settings.DB_VECTOR_SCHEMA}.{collection_name}"
@@ -76,15 +144,29 @@ class PgVectorClient:
         return PgVectorCollection(
             collection_name=collection_name,
             dimension=dim,  # Hardcoded for now
+            partition_by=self._registry.partitions.get(collection_name),
             session_maker=self.session_maker,
+            read_session_maker=self.read_session_maker,
         )
 
     def __is_collection_exists(self, collection_name: str) -> bool:
         return f"{settings.DB_VECTOR_SCHEMA}.{collection_name}" in self._metadata.tables
 
 
+_client: Optional[PgVectorClient] = None
+
+
 async def get_client() -> PgVectorClient:
-    return PgVectorClient(engine=async_engine, session_maker=session_factory)
+    """Return the client of the process, it holds no per-request state."""
+    global _client  # noqa: PLW0603
+    if _client is None:
+        _client = PgVectorClient(
+            engine=async_engine,
+            session_maker=session_factory,
+            read_engine=read_engine,
+            read_session_maker=read_session_factory,
+        )
+    return _client
 
 
 pg_client = Annotated[PgVectorClient, Depends(get_client)]
@@ -0,0 +1,123 @@
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Set
+
+from sqlalchemy import DateTime, String, delete, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.settings import settings
+from app.db.base import Base
+from app.db.partitions import quote_identifier
+
+# Run on the asyncpg connection of the transaction writing the chunks
+GET_DOCUMENT_SQL = """
+SELECT chunk_ids FROM {schema}.collection_documents
+WHERE collection_name = $1 AND source = $2
+"""
+
+SAVE_DOCUMENT_SQL = """
+INSERT INTO {schema}.collection_documents
+    (collection_name, source, chunk_ids, updated_at)
+VALUES ($1, $2, $3, now())
+ON CONFLICT (collection_name, source)
+DO UPDATE SET chunk_ids = EXCLUDED.chunk_ids, updated_at = EXCLUDED.updated_at
+"""
+
+
+class CollectionDocument(Base):
+    """Chunk ids of each document ingested into a collection."""
+
+    __tablename__ = "collection_documents"
+
+    collection_name: Mapped[str] = mapped_column(String, primary_key=True)
+    source: Mapped[str] = mapped_column(String, primary_key=True)
+    chunk_ids: Mapped[List[str]] = mapped_column(ARRAY(String), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+
+def _schema() -> str:
+    return quote_identifier(settings.DB_VECTOR_SCHEMA)
+
+
+async def create_document_table(engine: AsyncEngine) -> None:
+    """Create the document registry table if it does not exist yet."""
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[CollectionDocument.__table__],
+        )
+
+
+async def get_document_chunks(
+    session_maker: async_sessionmaker[AsyncSession],
+    collection_name: str,
+    source: str,
+) -> Optional[Set[str]]:
+    """Chunk ids stored for a document, None if it was never registered."""
+    stmt = select(CollectionDocument.chunk_ids).where(
+        CollectionDocument.collection_name == collection_name,
+        CollectionDocument.source == source,
+    )
+    async with session_maker() as session:
+        chunk_ids = await session.scalar(stmt)
+    return None if chunk_ids is None else set(chunk_ids)
+
+
+async def lock_document_chunks(
+    connection: Any,
+    collection_name: str,
+    source: str,
+) -> Optional[Set[str]]:
+    """
+    Chunk ids stored for a document, None if it was never registered.
+
+    The document stays locked until the transaction ends, so concurrent
+    ingests of the same document, including its first one, are applied one
+    after the other.
+    """
+    await connection.execute(
+        "SELECT pg_advisory_xact_lock(hashtext($1))",
+        f"documents:{collection_name}:{source}",
+    )
+    chunk_ids = await connection.fetchval(
+        GET_DOCUMENT_SQL.format(schema=_schema()),
+        collection_name,
+        source,
+    )
+    return None if chunk_ids is None else set(chunk_ids)
+
+
+async def save_document_chunks(
+    connection: Any,
+    collection_name: str,
+    source: str,
+    chunk_ids: Set[str],
+) -> None:
+    """Record the chunk ids of a document."""
+    await connection.execute(
+        SAVE_DOCUMENT_SQL.format(schema=_schema()),
+        collection_name,
+        source,
+        sorted(chunk_ids),
+    )
+
+
+async def forget_documents(
+    session_maker: async_sessionmaker[AsyncSession],
+    collection_name: str,
+    source: Optional[str] = None,
+) -> None:
+    """Remove a document, or all documents of a collection, from the registry."""
+    stmt = delete(CollectionDocument).where(
+        CollectionDocument.collection_name == collection_name,
+    )
+    if source is not None:
+        stmt = stmt.where(CollectionDocument.source == source)
+    async with session_maker() as session:
+        await session.execute(stmt)
+        await session.commit()
@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import BigInteger, DateTime, String, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class CollectionGeneration(Base):
+    """Counter bumped every time the content of a collection changes."""
+
+    __tablename__ = "collection_generations"
+
+    collection_name: Mapped[str] = mapped_column(String, primary_key=True)
+    generation: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+
+async def get_generation(
+    session_maker: async_sessionmaker[AsyncSession],
+    collection_name: str,
+) -> int:
+    """Return the current ingest generation of a collection."""
+    async with session_maker() as session:
+        generation = await session.scalar(
+            select(CollectionGeneration.generation).where(
+                CollectionGeneration.collection_name == collection_name,
+            ),
+        )
+    return generation or 0
+
+
+async def bump_generation(
+    session_maker: async_sessionmaker[AsyncSession],
+    collection_name: str,
+) -> int:
+    """Increase the ingest generation of a collection and return the new value."""
+    stmt = (
+        insert(CollectionGeneration)
+        .values(
+            collection_name=collection_name,
+            generation=1,
+            updated_at=datetime.now(timezone.utc),
+        )
+        .on_conflict_do_update(
+            index_elements=[CollectionGeneration.collection_name],
+            set_={
+                "generation": CollectionGeneration.generation + 1,
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+        .returning(CollectionGeneration.generation)
+    )
+    async with session_maker() as session:
+        generation = await session.scalar(stmt)
+        await session.commit()
+    return generation
+
+
+async def create_generation_table(engine: AsyncEngine) -> None:
+    """Create the generation table if it does not exist yet."""
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[CollectionGeneration.__table__],
+        )
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from functools import cached_property
-from typing import Any, AsyncIterator, Dict, List, Optional, Type
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Type
 
-from pgvector.sqlalchemy import Vector
+import orjson
 from pydantic import BaseModel, ConfigDict, Field
 from sqlalchemy import (
+    DateTime,
     String,
     and_,
     cast,
@@ -19,11 +22,44 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import AbstractConcreteBase
 from sqlalchemy.orm import Mapped, declared_attr, mapped_column
 
+from app.core.settings import settings
 from app.db.base import Base
+from app.db.partitions import PartitionSpec, quote_identifier
+from app.db.routing import reads_use_primary
+from app.db.vector import BinaryVector, to_vector
 from app.schemas.pgvector_schema import CollectionPoint, CollectionPointResult
 
 N_DIM = 1536
 
+# Statements of the fast paths run on the asyncpg connection, which caches
+# them as prepared statements by their text. The SQLAlchemy dialect registers
+# a jsonb codec on it: jsonb params are JSON text, jsonb results are decoded
+QUERY_SQL = """
+SELECT id, embedding, payload, 1 - (embedding <=> $1) AS score
+FROM {table}
+{where}
+ORDER BY embedding <=> $1
+LIMIT $2
+"""
+
+UPSERT_SQL = """
+INSERT INTO {table} ({columns})
+VALUES ({values})
+ON CONFLICT ON CONSTRAINT {constraint}
+DO UPDATE SET embedding = EXCLUDED.embedding, payload = EXCLUDED.payload
+"""
+
+
+DELETE_IDS_SQL = "DELETE FROM {table} WHERE id = ANY($1::text[])"
+
+EXPORT_SQL = """
+SELECT id, payload::text AS payload{embedding}
+FROM {table}
+{where}
+ORDER BY id
+LIMIT $1
+"""
+
 
 class AbstractCollection(AbstractConcreteBase, Base):
     __abstract__ = True
@@ -39,7 +75,7 @@ class AbstractCollection(AbstractConcreteBase, Base):
 
     @declared_attr
     def embedding(cls) -> Mapped[List[float]]:  # noqa: N805
-        return mapped_column("embedding", Vector(), nullable=False)
+        return mapped_column("embedding", BinaryVector(), nullable=False)
 
     payload: Mapped[Dict[str, Any]] = mapped_column(
         "payload",
@@ -69,6 +105,17 @@ class AbstractCollection(AbstractConcreteBase, Base):
         stmt = select(cls).where(cls.id == point_id)
         return await session.scalar(stmt.order_by(cls.id))
 
+    @classmethod
+    async def read_by_filter(
+        cls,
+        session: AsyncSession,
+        condition: Any,
+    ) -> AsyncIterator:
+        stmt = select(cls).where(condition)
+        stream = await session.stream_scalars(stmt.order_by(cls.id))
+        async for row in stream:
+            yield row
+
     @classmethod
     async def create(
         cls,
@@ -110,18 +157,62 @@ class AbstractCollection(AbstractConcreteBase, Base):
         await session.execute(stmt)
         await session.commit()
 
+    @classmethod
+    async def delete_many(cls, session: AsyncSession, ids: List[str]) -> int:
+        stmt = delete(cls).where(cls.id.in_(ids))
+        result = await session.execute(stmt)
+        await session.commit()
+        return result.rowcount
+
+    @classmethod
+    async def delete_by_filter(cls, session: AsyncSession, condition: Any) -> int:
+        stmt = delete(cls).where(condition)
+        result = await session.execute(stmt)
+        await session.commit()
+        return result.rowcount
+
 
 class PgVectorCollection(BaseModel):
     collection_name: str
     dimension: int
+    partition_by: Optional[PartitionSpec] = None
     session_maker: async_sessionmaker[AsyncSession] = Field(..., exclude=True)
+    # Sessions of reads, on the replica when one is configured
+    read_session_maker: Optional[async_sessionmaker[AsyncSession]] = Field(
+        None,
+        exclude=True,
+    )
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
     @cached_property
     def table(self) -> Type[AbstractCollection]:
         return self.build_table()
 
+    @property
+    def table_uri(self) -> str:
+        """Qualified table name quoted for the statements built as text."""
+        return (
+            f"{quote_identifier(settings.DB_VECTOR_SCHEMA)}."
+            f"{quote_identifier(self.collection_name)}"
+        )
+
+    def reader(self, primary: bool = False) -> async_sessionmaker[AsyncSession]:
+        """Session maker of a read, the primary one for read-your-writes."""
+        if primary or reads_use_primary() or self.read_session_maker is None:
+            return self.session_maker
+        return self.read_session_maker
+
+    @property
+    def partition_field(self) -> Optional[str]:
+        """Payload field the table is partitioned by, if any."""
+        return self.partition_by.payload_field if self.partition_by else None
+
     def build_table(self) -> Type[AbstractCollection]:
+        table_args: Dict[str, Any] = {"extend_existing": True}
+        if self.partition_by is not None:
+            table_args["postgresql_partition_by"] = self.partition_by.clause
+        field = self.partition_field
+
         class CustomCollectionTable(AbstractCollection):
             __tablename__ = self.collection_name
             __dimensions__ = self.dimension
@@ -129,13 +220,42 @@ class PgVectorCollection(BaseModel):
                 "polymorphic_identity": self.collection_name,
                 "concrete": True,
             }
-            __table_args__ = {"extend_existing": True}  # noqa: RUF012
+            __table_args__ = table_args
+
+            if self.partition_by is not None:
+                # Primary key of a partitioned table must contain the partition
+                # key, so id is only unique within a partition.
+                id: Mapped[str] = mapped_column(
+                    "id",
+                    String,
+                    autoincrement=False,
+                    nullable=False,
+                    primary_key=True,
+                )
+            if self.partition_by is not None and field is None:
+                created_at: Mapped[datetime] = mapped_column(
+                    "created_at",
+                    DateTime(timezone=True),
+                    default=lambda: datetime.now(timezone.utc),
+                    nullable=False,
+                    primary_key=True,
+                )
+            elif field is not None:
+                # Copy of the payload field, set when a point is inserted
+                partition_key: Mapped[str] = mapped_column(
+                    field,
+                    String,
+                    default=partition_key_default(field),
+                    server_default="",
+                    nullable=False,
+                    primary_key=True,
+                )
 
             @declared_attr
             def embedding(cls) -> Mapped[List[float]]:  # noqa: N805
                 return mapped_column(
                     "embedding",
-                    Vector(self.dimension),
+                    BinaryVector(self.dimension),
                     nullable=False,
                 )
 
@@ -170,6 +290,60 @@ class PgVectorCollection(BaseModel):
                     payload=payload,
                 )
 
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Any]:
+        """
+        asyncpg connection of the primary inside a transaction.
+
+        Pass it as connection to the batch writes to commit them together.
+        """
+        async with self.session_maker() as session:
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            driver_connection = raw_connection.driver_connection
+            async with driver_connection.transaction():
+                yield driver_connection
+
+    async def upsert_many(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        payloads: List[Dict[str, Any]],
+        connection: Optional[Any] = None,
+    ) -> None:
+        """
+        Insert or update points in one batch, vectors are sent in binary.
+
+        Runs on connection when given, see transaction.
+        """
+        if not ids:
+            return
+        columns = ["id", "embedding", "payload"]
+        field = self.partition_field
+        if self.partition_by is not None:
+            columns.append(field or "created_at")
+        sql = UPSERT_SQL.format(
+            table=self.table_uri,
+            # Named by the pk naming convention of app.db.base
+            constraint=quote_identifier(f"pk_{self.collection_name}"),
+            columns=", ".join(quote_identifier(column) for column in columns),
+            values=", ".join(f"${i}" for i in range(1, len(columns) + 1)),
+        )
+        created_at = datetime.now(timezone.utc)
+        records = []
+        for id, embedding, payload in zip(ids, embeddings, payloads):
+            record = [id, to_vector(embedding), orjson.dumps(payload).decode()]
+            if field is not None:
+                record.append(partition_value(payload, field))
+            elif self.partition_by is not None:
+                record.append(created_at)
+            records.append(record)
+        if connection is not None:
+            await connection.executemany(sql, records)
+            return
+        async with self.transaction() as driver_connection:
+            await driver_connection.executemany(sql, records)
+
     async def create(self) -> None:
         pass
 
@@ -177,51 +351,80 @@ class PgVectorCollection(BaseModel):
         async with self.session_maker() as session:
             await self.table.delete(session=session, id=id)
 
+    async def delete_many(
+        self,
+        ids: List[str],
+        connection: Optional[Any] = None,
+    ) -> int:
+        if not ids:
+            return 0
+        if connection is not None:
+            status = await connection.execute(
+                DELETE_IDS_SQL.format(table=self.table_uri),
+                ids,
+            )
+            # Command tag "DELETE <rows>"
+            return int(status.split()[-1])
+        async with self.session_maker() as session:
+            return await self.table.delete_many(session=session, ids=ids)
+
+    async def delete_by_filter(self, filter_dict: Dict[str, Any]) -> int:
+        # Delete all collection points whose payload matches the filter
+        condition = self._build_filter_expressions(self.table.payload, filter_dict)
+        async with self.session_maker() as session:
+            return await self.table.delete_by_filter(
+                session=session,
+                condition=condition,
+            )
+
+    async def delete_all(self) -> None:
+        # TRUNCATE also empties every partition of a partitioned table
+        async with self.session_maker() as session:
+            await session.execute(text(f"TRUNCATE TABLE {self.table_uri}"))
+            await session.commit()
+
     async def query(
         self,
         query: List[float],
         limit: int = 10,
         filter_dict: Optional[Dict[str, Any]] = None,
+        primary: bool = False,
     ) -> List[CollectionPointResult]:
-        if self.table is None:
-            return []
-
-        stmt = select(self.table).order_by(self.table.embedding.cosine_distance(query))
-        # add column with cosine similarity
-        stmt = stmt.column(
-            (1 - self.table.embedding.cosine_distance(query)).label(
-                "cosine_similarity",
-            ),
-        )
+        """
+        Nearest points by cosine similarity.
+
+        Runs directly on the asyncpg connection: the query vector and the
+        returned embeddings use the binary codec, and the statement text only
+        depends on the collection and the shape of the filter, so it is
+        prepared once per connection and reused.
+        """
+        params: List[Any] = [to_vector(query), limit]
+        where = ""
         if filter_dict is not None:
-            filter_expressions = self._build_filter_expressions(
-                self.table.metadata,
-                filter_dict,
-            )
-            stmt = stmt.filter(filter_expressions)
+            where = f"WHERE {self._compile_filter(filter_dict, params)}"
+        sql = QUERY_SQL.format(table=self.table_uri, where=where)
 
-        stmt = stmt.limit(limit)
-        async with self.session_maker() as session:
-            query_execution = await session.execute(stmt)
-            # After adding column cosine_similarity to stmt
-            # the result is a tuple of (CollectionTable, cosine_similarity)
-            results = query_execution.all()
+        async with self.reader(primary)() as session:
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            rows = await raw_connection.driver_connection.fetch(sql, *params)
 
         return [
             CollectionPointResult(
                 payload=CollectionPoint(
-                    id=result[0].id,
-                    embedding=result[0].embedding,
-                    payload=result[0].payload,
+                    id=row["id"],
+                    embedding=row["embedding"],
+                    # Decoded by the jsonb codec of the SQLAlchemy dialect
+                    payload=row["payload"],
                 ),
-                score=result[1],
+                score=row["score"],
             )
-            for result in results
+            for row in rows
         ]
 
-    async def get(self, id: str) -> CollectionPoint:
+    async def get(self, id: str, primary: bool = False) -> CollectionPoint:
         # Get collection point with the given id
-        async with self.session_maker() as session:
+        async with self.reader(primary)() as session:
             result = await self.table.read_by_id(session=session, point_id=id)
             if result is None:
                 raise ValueError(
@@ -233,8 +436,8 @@ class PgVectorCollection(BaseModel):
                 payload=result.payload,
             )
 
-    async def query_all(self) -> list:
-        async with self.session_maker() as session:
+    async def query_all(self, primary: bool = False) -> list:
+        async with self.reader(primary)() as session:
             results = self.table.read_all(session=session, include_metadata=True)
             return [
                 CollectionPoint(
@@ -245,6 +448,78 @@ class PgVectorCollection(BaseModel):
                 async for result in results
             ]
 
+    async def export(
+        self,
+        after_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_embedding: bool = False,
+        primary: bool = False,
+    ) -> AsyncIterator[Any]:
+        """
+        Stream the points ordered by id, starting after after_id.
+
+        Rows are read through a server-side cursor, settings.EXPORT_FETCH_SIZE
+        at a time, so memory does not grow with the collection. Payloads are
+        returned as JSON text and embeddings as float32 arrays.
+        """
+        params: List[Any] = [limit]
+        where = ""
+        if after_id is not None:
+            # Keyset pagination on the primary key
+            params.append(after_id)
+            where = "WHERE id > $2"
+        sql = EXPORT_SQL.format(
+            table=self.table_uri,
+            where=where,
+            embedding=", embedding" if include_embedding else "",
+        )
+
+        async with self.reader(primary)() as session:
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            driver_connection = raw_connection.driver_connection
+            # Cursors only exist inside a transaction
+            async with driver_connection.transaction():
+                async for row in driver_connection.cursor(
+                    sql,
+                    *params,
+                    prefetch=settings.EXPORT_FETCH_SIZE,
+                ):
+                    yield row
+
+    async def find_ids(
+        self,
+        filter_dict: Dict[str, Any],
+        primary: bool = False,
+    ) -> List[str]:
+        """Ids of the points whose payload matches the filter, without the points."""
+        params: List[Any] = []
+        condition = self._compile_filter(filter_dict, params)
+        sql = f"SELECT id FROM {self.table_uri} WHERE {condition}"  # noqa: S608
+        async with self.reader(primary)() as session:
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            rows = await raw_connection.driver_connection.fetch(sql, *params)
+        return [row["id"] for row in rows]
+
+    async def find(
+        self,
+        filter_dict: Dict[str, Any],
+        primary: bool = False,
+    ) -> List[CollectionPoint]:
+        # Get collection points whose payload matches the filter
+        condition = self._build_filter_expressions(self.table.payload, filter_dict)
+        async with self.reader(primary)() as session:
+            results = self.table.read_by_filter(session=session, condition=condition)
+            return [
+                CollectionPoint(
+                    id=result.id,
+                    embedding=result.embedding,
+                    payload=result.payload,
+                )
+                async for result in results
+            ]
+
     async def update(
         self,
         id: str,
@@ -277,6 +552,38 @@ class PgVectorCollection(BaseModel):
             else:
                 raise e
 
+    def _compile_filter(self, filter_dict: Dict[str, Any], params: List[Any]) -> str:
+        """
+        SQL condition of a filter for the fast paths, values are added to params.
+
+        Supports the operators of _build_filter_expressions and produces the
+        same payload -> 'key' expressions, so payload indexes still apply.
+        """
+        key, value = list(filter_dict.items())[-1]
+
+        if key in ("$and", "$or"):
+            joiner = " AND " if key == "$and" else " OR "
+            return "({})".format(
+                joiner.join(self._compile_filter(f, params) for f in value),
+            )
+
+        operator, filter_value = value.copy().popitem()
+
+        if not isinstance(filter_value, str):
+            raise ValueError("Filter value must be a string")
+        if operator not in ("$eq", "$ne"):
+            raise ValueError(f"Unsupported operator {operator}")
+
+        if key == self.partition_field and operator == "$eq":
+            # Compared on the partition key column to prune partitions
+            params.append(filter_value)
+            return f"{quote_identifier(key)} = ${len(params)}"
+
+        params.append(orjson.dumps(filter_value).decode())
+        comparison = "=" if operator == "$eq" else "!="
+        quoted_key = key.replace("'", "''")
+        return f"payload -> '{quoted_key}' {comparison} ${len(params)}::jsonb"
+
     def _build_filter_expressions(
         self,
         col: Mapped[Dict[str, Any]],
@@ -318,6 +625,10 @@ class PgVectorCollection(BaseModel):
         if not isinstance(filter_value, str):
             raise ValueError("Filter value must be a string")
 
+        if key == self.partition_field and operator == "$eq":
+            # Compared on the partition key column to prune partitions
+            return self.table.__table__.c[key] == filter_value
+
         value = cast(filter_value, JSONB)
         operation = col.op("->")(key)
 
@@ -332,6 +643,22 @@ class PgVectorCollection(BaseModel):
         return f"Collection(name={self.collection_name}, dimension={self.dimension})"
 
 
+def partition_value(payload: Dict[str, Any], field: str) -> str:
+    """Value of the partition key column of a point partitioned by a field."""
+    value = payload.get(field)
+    return "" if value is None else str(value)
+
+
+def partition_key_default(field: str) -> Callable[[Any], str]:
+    """Column default copying the partition field out of the inserted payload."""
+
+    def default(context: Any) -> str:
+        payload = context.get_current_parameters().get("payload") or {}
+        return partition_value(payload, field)
+
+    return default
+
+
 def is_duplicate_key_error(error_message: str) -> bool:
     """Check if the error message indicates a duplicate key constraint violation."""
     return "duplicate key value violates unique constraint" in error_message
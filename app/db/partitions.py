@@ -0,0 +1,257 @@
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.settings import settings
+
+# Daily partitions are named <table>_pYYYYMMDD
+PARTITION_DATE_FORMAT = "%Y%m%d"
+
+LIST_PARTITIONED_TABLES_SQL = """
+SELECT c.relname, pt.partstrat, a.attname
+FROM pg_partitioned_table pt
+JOIN pg_class c ON c.oid = pt.partrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+WHERE n.nspname = :schema
+"""
+
+LIST_PARTITIONS_SQL = """
+SELECT c.relname
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_class p ON p.oid = i.inhparent
+JOIN pg_namespace n ON n.oid = p.relnamespace
+WHERE n.nspname = :schema AND p.relname = :table_name
+"""
+
+# Same, with whether a DETACH ... CONCURRENTLY of the partition was interrupted
+LIST_PARTITIONS_DETACH_SQL = """
+SELECT c.relname, i.inhdetachpending
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_class p ON p.oid = i.inhparent
+JOIN pg_namespace n ON n.oid = p.relnamespace
+WHERE n.nspname = :schema AND p.relname = :table_name
+"""
+
+
+class PartitionSpec(BaseModel):
+    """
+    How a collection table is partitioned.
+
+    "range" partitions by day of created_at. "list" and "hash" partition by
+    a payload field, whose value is copied into a text column of the same
+    name so that filters on it prune partitions.
+    """
+
+    strategy: str = "range"
+    column: str = "created_at"
+    # Partitions of a hash partitioned table
+    modulus: int = 16
+    # Values given their own list partition, the others share a default one
+    values: List[str] = []
+
+    @property
+    def clause(self) -> str:
+        return f"{self.strategy.upper()} ({quote_identifier(self.column)})"
+
+    @property
+    def payload_field(self) -> Optional[str]:
+        """Payload field the table is partitioned by, if any."""
+        return None if self.strategy == "range" else self.column
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for a statement built as text."""
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _qualified(table_name: str) -> str:
+    schema = quote_identifier(settings.DB_VECTOR_SCHEMA)
+    return f"{schema}.{quote_identifier(table_name)}"
+
+
+async def get_partition_specs(engine: AsyncEngine) -> Dict[str, PartitionSpec]:
+    """Return the partition spec of every partitioned table in the vector schema."""
+    strategies = {"r": "range", "l": "list", "h": "hash"}
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text(LIST_PARTITIONED_TABLES_SQL),
+            {"schema": settings.DB_VECTOR_SCHEMA},
+        )
+        return {
+            table_name: PartitionSpec(strategy=strategies[strategy], column=column)
+            for table_name, strategy, column in result.fetchall()
+        }
+
+
+def _partition_name(table_name: str, day: date) -> str:
+    return f"{table_name}_p{day.strftime(PARTITION_DATE_FORMAT)}"
+
+
+def _partition_day(table_name: str, partition_name: str) -> Optional[date]:
+    prefix = f"{table_name}_p"
+    if not partition_name.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(
+            partition_name[len(prefix) :],
+            PARTITION_DATE_FORMAT,
+        ).date()
+    except ValueError:
+        return None
+
+
+def _utc_bound(day: date) -> str:
+    # Explicit offset, a bare date would be read in the session time zone
+    return f"{day.isoformat()}T00:00:00+00"
+
+
+async def ensure_time_partitions(
+    engine: AsyncEngine,
+    table_name: str,
+    days_ahead: int,
+    start: Optional[date] = None,
+) -> None:
+    """Create the daily partitions from start (default today) to days_ahead."""
+    start = start or datetime.utcnow().date()
+    async with engine.begin() as conn:
+        # Serialize workers creating the same partitions
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+            {"name": f"partitions:{table_name}"},
+        )
+        for offset in range(days_ahead + 1):
+            day = start + timedelta(days=offset)
+            await conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS "
+                    f"{_qualified(_partition_name(table_name, day))} "
+                    f"PARTITION OF {_qualified(table_name)} "
+                    f"FOR VALUES FROM ('{_utc_bound(day)}') "
+                    f"TO ('{_utc_bound(day + timedelta(days=1))}')",
+                ),
+            )
+
+
+async def create_key_partitions(
+    engine: AsyncEngine,
+    table_name: str,
+    partition_by: PartitionSpec,
+) -> None:
+    """Create the partitions of a table partitioned by a payload field."""
+    if partition_by.strategy == "hash":
+        bounds = {
+            f"{table_name}_h{remainder}": (
+                f"FOR VALUES WITH (MODULUS {partition_by.modulus}, "
+                f"REMAINDER {remainder})"
+            )
+            for remainder in range(partition_by.modulus)
+        }
+    else:
+        bounds = {f"{table_name}_default": "DEFAULT"}
+        for value in partition_by.values:
+            # Values are not valid identifiers, partitions are named by digest
+            digest = hashlib.md5(value.encode()).hexdigest()[:8]  # noqa: S324
+            quoted = value.replace("'", "''")
+            bounds[f"{table_name}_l{digest}"] = f"FOR VALUES IN ('{quoted}')"
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+            {"name": f"partitions:{table_name}"},
+        )
+        for name, bound in bounds.items():
+            await conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {_qualified(name)} "
+                    f"PARTITION OF {_qualified(table_name)} {bound}",
+                ),
+            )
+    logger.info(f"Created {len(bounds)} partitions of {table_name}")
+
+
+async def drop_expired_partitions(
+    engine: AsyncEngine,
+    table_name: str,
+    retention_days: int,
+) -> List[str]:
+    """
+    Drop the daily partitions that are entirely older than retention_days.
+
+    Partitions are detached concurrently first so that readers and writers of
+    the parent table are not blocked, then dropped. One worker runs it at a
+    time, the others skip the run. Detaches left pending by an interrupted run
+    are finalized before new ones start.
+    """
+    cutoff = datetime.utcnow().date() - timedelta(days=retention_days)
+    lock = {"name": f"partitions:{table_name}"}
+    async with engine.connect() as connection:
+        # DETACH ... CONCURRENTLY cannot run inside a transaction block, so the
+        # lock is held by the session until unlocked or the connection closes
+        conn = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        locked = await conn.scalar(
+            text("SELECT pg_try_advisory_lock(hashtext(:name))"),
+            lock,
+        )
+        if not locked:
+            logger.info(f"Partitions of {table_name} are maintained by another worker")
+            return []
+        try:
+            return await _drop_partitions_before(conn, table_name, cutoff)
+        except BaseException:
+            # The unlock may not get through, closing the session releases it
+            await connection.invalidate()
+            raise
+        finally:
+            if not connection.invalidated:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:name))"),
+                    lock,
+                )
+
+
+async def _drop_partitions_before(
+    conn: AsyncConnection,
+    table_name: str,
+    cutoff: date,
+) -> List[str]:
+    result = await conn.execute(
+        text(LIST_PARTITIONS_DETACH_SQL),
+        {"schema": settings.DB_VECTOR_SCHEMA, "table_name": table_name},
+    )
+    partitions = result.fetchall()
+    parent = _qualified(table_name)
+
+    for name, detach_pending in partitions:
+        if detach_pending:
+            await conn.execute(
+                text(
+                    f"ALTER TABLE {parent} "
+                    f"DETACH PARTITION {_qualified(name)} FINALIZE",
+                ),
+            )
+            logger.info(f"Finalized the pending detach of partition {name}")
+
+    expired = []
+    for name, detach_pending in partitions:
+        day = _partition_day(table_name, name)
+        if day is None or day >= cutoff:
+            continue
+        if not detach_pending:
+            await conn.execute(
+                text(
+                    f"ALTER TABLE {parent} "
+                    f"DETACH PARTITION {_qualified(name)} CONCURRENTLY",
+                ),
+            )
+        await conn.execute(text(f"DROP TABLE IF EXISTS {_qualified(name)}"))
+        logger.info(f"Dropped expired partition {name}")
+        expired.append(name)
+    return expired
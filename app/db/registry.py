@@ -0,0 +1,37 @@
+import asyncio
+from typing import Dict, Optional
+
+from app.db.models import PgVectorCollection
+from app.db.partitions import PartitionSpec
+
+
+class CollectionRegistry:
+    """
+    Process-wide cache of the collections of the vector schema.
+
+    The schema is reflected once, collections are added when they are
+    created or first looked up, so requests never reflect the schema.
+    A collection keeps its mapped table class, which is built only once.
+    """
+
+    def __init__(self) -> None:
+        self.collections: Dict[str, PgVectorCollection] = {}
+        self.partitions: Dict[str, PartitionSpec] = {}
+        self.loaded = False
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Serializes reflection, created in the running event loop."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def get(self, collection_name: str) -> Optional[PgVectorCollection]:
+        return self.collections.get(collection_name)
+
+    def add(self, collection: PgVectorCollection) -> None:
+        self.collections[collection.collection_name] = collection
+
+
+collection_registry = CollectionRegistry()
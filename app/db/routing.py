@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+# Set while the reads of the current task must see its own writes
+_read_from_primary: ContextVar[bool] = ContextVar("read_from_primary", default=False)
+
+
+@contextmanager
+def read_your_writes() -> Iterator[None]:
+    """
+    Send the collection reads of the block to the primary.
+
+    A replica may lag behind the writes just made by the same request, reads
+    that must see them run in this block or pass primary=True.
+    """
+    token = _read_from_primary.set(True)
+    try:
+        yield
+    finally:
+        _read_from_primary.reset(token)
+
+
+def reads_use_primary() -> bool:
+    """Whether reads of the current task are pinned to the primary."""
+    return _read_from_primary.get()
@@ -1,9 +1,19 @@
+import asyncio
+from typing import Any
+
 from loguru import logger
 from sqlalchemy import AdaptedConnection, event, text
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.schema import CreateSchema
 
 from app.core.settings import settings
+from app.db.vector import register_vector_codec
+from app.utils.metrics import instrument_pool
+
+# Advisory lock held while the database is bootstrapped, any constant works
+# as long as no other code of the database uses it
+BOOTSTRAP_LOCK_KEY = 7263140651
 
 
 async def _create_db_if_not_exists() -> None:
@@ -31,6 +41,63 @@ async def _create_db_if_not_exists() -> None:
             await conn.close()
     else:
         logger.info(f"Database '{settings.PGVECTOR_DB}' already exists.")
+    await base_engine.dispose()
+
+
+async def _bootstrap_db() -> None:
+    """
+    Create the vector extension and schema, once per database.
+
+    Runs at startup before the pools open, on a connection of its own as the
+    pooled ones need the extension for their codec. Workers starting
+    together serialize on an advisory lock instead of racing on the
+    catalog.
+    """
+    bootstrap_engine = create_async_engine(settings.db_url, poolclass=NullPool)
+    create_vectordb_schema = CreateSchema(
+        settings.DB_VECTOR_SCHEMA,
+        if_not_exists=True,
+    )
+    try:
+        async with bootstrap_engine.begin() as conn:
+            # Released when the transaction ends
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": BOOTSTRAP_LOCK_KEY},
+            )
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            await conn.execute(create_vectordb_schema)
+        logger.info("Vector extension and schema are in place.")
+    finally:
+        await bootstrap_engine.dispose()
+
+
+def _create_engine(url: str, pool_name: str) -> AsyncEngine:
+    engine: AsyncEngine = create_async_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        echo=settings.PGVECTOR_ECHO,
+        connect_args={
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+    instrument_pool(
+        engine,
+        settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+        pool_name,
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def register_vector(dbapi_connection: AdaptedConnection, *args: Any) -> None:
+        # Only per-connection state here, the schema is set up by _bootstrap_db.
+        # Vectors are exchanged in binary, see app.db.vector
+        dbapi_connection.run_async(register_vector_codec)
+
+    return engine
 
 
 def _setup_db() -> AsyncEngine:
@@ -44,38 +111,47 @@ def _setup_db() -> AsyncEngine:
     :param app: fastAPI application.
     """
     logger.info("Connecting to the database...")
-    async_engine: AsyncEngine = create_async_engine(
-        settings.db_url,
-        pool_pre_ping=True,
-        echo=settings.PGVECTOR_ECHO,
-    )
-
-    @event.listens_for(async_engine.sync_engine, "connect")
-    def register_vector(dbapi_connection: AdaptedConnection, *args) -> None:  # noqa: ANN002, E501
-        # register vector extension
-        create_extension = "CREATE EXTENSION IF NOT EXISTS vector"
-        dbapi_connection.run_async(lambda conn: conn.execute(create_extension))
-
-        logger.info("Vector extension creation check attempted.")
-        # create schema if it doesn't exist yet
-        create_vectordb_schema = CreateSchema(
-            settings.DB_VECTOR_SCHEMA,
-            if_not_exists=True,
-        )
-        dbapi_connection.run_async(
-            lambda conn: conn.execute(create_vectordb_schema.compile().string),
-        )
+    return _create_engine(settings.db_url, "primary")
 
-        logger.info("Database connected.")
 
-        logger.info("Database initialized and all tables created if they didn't exist.")
+def _setup_read_db(primary: AsyncEngine) -> AsyncEngine:
+    """
+    Creates the engine of collection reads.
 
-    return async_engine
+    Without a configured replica the primary engine is returned, so reads
+    and writes share one pool.
+    """
+    if not settings.PGVECTOR_REPLICA_URL:
+        return primary
+    logger.info("Connecting to the read replica...")
+    return _create_engine(settings.read_db_url, "replica")
+
+
+async def prewarm_pool(engine: AsyncEngine, connections: int) -> None:
+    """Open pool connections up front so that first requests do not connect."""
+    connections = min(connections, settings.DB_POOL_SIZE)
+    if connections <= 0:
+        return
+    opened = await asyncio.gather(
+        *(engine.connect().start() for _ in range(connections)),
+    )
+    # Closing returns them to the pool
+    await asyncio.gather(*(conn.close() for conn in opened))
+    logger.info(f"Opened {connections} database connections")
 
 
+# The engines of the process, shared by every service. Writes go to the
+# primary, collection reads to read_engine, which is the primary as well
+# unless PGVECTOR_REPLICA_URL is set.
 async_engine = _setup_db()
 session_factory = async_sessionmaker(
     bind=async_engine,
     autoflush=False,
     future=True,
 )
+read_engine = _setup_read_db(async_engine)
+read_session_factory = async_sessionmaker(
+    bind=read_engine,
+    autoflush=False,
+    future=True,
+)
@@ -0,0 +1,46 @@
+from typing import Any, Callable, Optional
+
+import numpy as np
+from pgvector.asyncpg import register_vector
+from pgvector.sqlalchemy import VECTOR
+
+from app.core.settings import settings
+
+
+class BinaryVector(VECTOR):
+    """
+    pgvector column exchanged in the binary wire format.
+
+    Values are bound as float32 arrays for the asyncpg codec registered on
+    every connection and read back as the float32 arrays it decodes, so
+    vectors are never formatted as or parsed from text.
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect: Any) -> Callable:
+        dim = self.dim
+
+        def process(value: Any) -> Optional[np.ndarray]:
+            if value is None:
+                return None
+            value = to_vector(value)
+            if dim is not None and value.shape[0] != dim:
+                raise ValueError(f"expected {dim} dimensions, not {value.shape[0]}")
+            return value
+
+        return process
+
+    def result_processor(self, dialect: Any, coltype: Any) -> None:
+        # The codec already returns float32 arrays
+        return None
+
+
+def to_vector(value: Any) -> np.ndarray:
+    """Convert an embedding to the float32 array bound for the vector codec."""
+    return np.asarray(value, dtype=np.float32)
+
+
+async def register_vector_codec(connection: Any) -> None:
+    """Register the binary vector codec on an asyncpg connection."""
+    await register_vector(connection, schema=settings.DB_VECTOR_EXTENSION_SCHEMA)
@@ -1,6 +1,7 @@
 from typing import Any
 
 from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
 from gunicorn.util import import_app
 from uvicorn.workers import UvicornWorker as BaseUvicornWorker
 
@@ -28,6 +29,13 @@ class UvicornWorker(BaseUvicornWorker):
     }
 
 
+def child_exit(server: Arbiter, worker: BaseUvicornWorker) -> None:
+    """Drop the live gauges of a dead worker from the aggregated metrics."""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
 class GunicornApplication(BaseApplication):
     """
     Custom gunicorn application.
@@ -48,6 +56,7 @@ class GunicornApplication(BaseApplication):
             "bind": f"{host}:{port}",
             "workers": workers,
             "worker_class": "app.gunicorn_runner.UvicornWorker",
+            "child_exit": child_exit,
             **kwargs,
         }
         self.app = app
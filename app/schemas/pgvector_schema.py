@@ -1,12 +1,15 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Union
 
-from pydantic import BaseModel
+import numpy as np
+from pydantic import BaseModel, ConfigDict
 
 
 class CollectionPoint(BaseModel):
     id: str
-    embedding: List[float] = []
+    # float32 arrays as decoded by the vector codec are kept as they are
+    embedding: Union[np.ndarray, List[float]] = []
     payload: Dict[str, Any] = {}
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
 class CollectionPointResult(BaseModel):
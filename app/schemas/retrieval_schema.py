@@ -19,3 +19,14 @@ class RetrievalRecord(BaseModel):
 
 class RetrievalResponse(BaseModel):
     records: List[RetrievalRecord]
+
+
+class PackedContext(BaseModel):
+    text: str
+    tokens: int
+    original_tokens: int
+    chunks: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
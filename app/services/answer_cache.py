@@ -0,0 +1,113 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from app.core.settings import settings
+from app.db.dependencies import PgVectorClient
+from app.db.generations import get_generation
+from app.utils.metrics import ANSWER_CACHE_EVENTS
+
+ANSWER_CACHE_COLLECTION_NAME = "vimo_answer_cache"
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers keyed by query embedding.
+
+    An entry is only served while the document collection it was generated
+    from is still at the same ingest generation, and for the same model.
+    Entries are not tied to a conversation, so only the opening question of
+    a session is looked up and stored.
+    """
+
+    def __init__(self, client: PgVectorClient) -> None:
+        self.client = client
+        self.similarity_threshold = settings.ANSWER_CACHE_SIMILARITY
+        self.ttl = timedelta(seconds=settings.ANSWER_CACHE_TTL_SECONDS)
+        # Generation each collection's entries were last evicted for
+        self._evicted_generations: Dict[str, str] = {}
+
+    async def lookup(
+        self,
+        query_embedding: List[float],
+        collection_name: str,
+        model: str,
+    ) -> Optional[str]:
+        """Return a cached answer for a near-duplicate question, if any."""
+        collection = await self.client.get_or_create_collection(
+            ANSWER_CACHE_COLLECTION_NAME,
+            len(query_embedding),
+        )
+        generation = await get_generation(self.client.session_maker, collection_name)
+        results = await collection.query(
+            query=query_embedding,
+            limit=1,
+            filter_dict={
+                "$and": [
+                    {"collection": {"$eq": collection_name}},
+                    {"generation": {"$eq": str(generation)}},
+                    {"model": {"$eq": model}},
+                ],
+            },
+        )
+        if not results or results[0].score < self.similarity_threshold:
+            ANSWER_CACHE_EVENTS.labels(event="miss").inc()
+            return None
+
+        entry = results[0].payload
+        created_at = datetime.fromisoformat(entry.payload["timestamp"])
+        if datetime.utcnow() - created_at > self.ttl:
+            await collection.delete(entry.id)
+            ANSWER_CACHE_EVENTS.labels(event="eviction").inc()
+            ANSWER_CACHE_EVENTS.labels(event="miss").inc()
+            return None
+
+        ANSWER_CACHE_EVENTS.labels(event="hit").inc()
+        logger.info(f"Answer cache hit with similarity {results[0].score:.4f}")
+        return entry.payload["answer"]
+
+    async def store(
+        self,
+        query: str,
+        query_embedding: List[float],
+        collection_name: str,
+        model: str,
+        answer: str,
+    ) -> None:
+        """Cache an answer and evict entries of older ingest generations."""
+        collection = await self.client.get_or_create_collection(
+            ANSWER_CACHE_COLLECTION_NAME,
+            len(query_embedding),
+        )
+        generation = str(
+            await get_generation(self.client.session_maker, collection_name),
+        )
+        if self._evicted_generations.get(collection_name) != generation:
+            # Entries of older generations are never served, the filter has
+            # no index, so they are deleted once per generation change
+            evicted = await collection.delete_by_filter(
+                {
+                    "$and": [
+                        {"collection": {"$eq": collection_name}},
+                        {"generation": {"$ne": generation}},
+                    ],
+                },
+            )
+            self._evicted_generations[collection_name] = generation
+            if evicted:
+                ANSWER_CACHE_EVENTS.labels(event="eviction").inc(evicted)
+
+        await collection.upsert(
+            id=str(uuid.uuid4()),
+            embedding=query_embedding,
+            payload={
+                "query": query,
+                "answer": answer,
+                "collection": collection_name,
+                "generation": generation,
+                "model": model,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+        )
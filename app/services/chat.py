@@ -1,24 +1,57 @@
-import json
+import asyncio
+import time
 import uuid
-from datetime import datetime
-from typing import AsyncGenerator, Optional
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, List, Optional, Set, Union
 
+import orjson
 from fastapi import Depends
+from loguru import logger
 
+from app.core.settings import settings
 from app.db.dependencies import pg_client
-from app.services.prompts import SYSTEM_PROMPT, USER_MESSAGE_TEMPLATE
-from app.services.retrieval import RetrievalService
+from app.db.partitions import drop_expired_partitions, ensure_time_partitions
+from app.schemas.retrieval_schema import RetrievalRecord
+from app.services.answer_cache import AnswerCache
+from app.services.context import compress_records, pack_context
+from app.services.embeddings import get_embedding_provider
+from app.services.prompts import (
+    SUMMARY_SYSTEM_PROMPT,
+    SUMMARY_USER_TEMPLATE,
+    SYSTEM_PROMPT,
+    USER_MESSAGE_TEMPLATE,
+)
+from app.services.retrieval import (
+    CHAT_HISTORY_PARTITION,
+    SUMMARY_ROLE,
+    RetrievalService,
+)
+from app.utils.embedding_batcher import embed_query
+from app.utils.llm_hedging import hedged_chat_completion_stream
+from app.utils.metrics import (
+    ANSWER_TIME_TO_FIRST_TOKEN,
+    CONTEXT_TOKENS,
+    STAGE_DURATION,
+)
 from app.utils.openai_connect import (
     END_OF_STREAM,
     USAGE_CHAR,
-    chat_completion_stream,
-    embed,
+    ChunkStream,
+    chat_completion,
+    num_tokens_from_messages,
 )
+from app.utils.stream_frames import coalesce_chunks
 
 DOCUMENT_COLLECTION_NAME = "vimo_documents"
 
+# Answer events, text for Dify and NDJSON lines otherwise
+AnswerEvent = Union[str, bytes]
+
 CHAT_COLLECTION_NAME = "vimo_chat_history"
 
+# Sessions currently being compacted by this worker
+_compacting_sessions: Set[str] = set()
+
 
 class ChatService:
     def __init__(
@@ -30,19 +63,77 @@ class ChatService:
         self.score_threshold = 0.5
         self.retrieve_service = retrieve_service
         self.client = client
+        self.answer_cache = AnswerCache(client)
+        self.dimension = get_embedding_provider().dimension
 
     async def clear_sessions(self, session_id: Optional[str] = None) -> None:
         """Delete all sessions or a specific session."""
         collection = await self.client.get_or_create_collection(
             CHAT_COLLECTION_NAME,
-            1536,
+            self.dimension,
+            CHAT_HISTORY_PARTITION,
         )
         if session_id is None:
             # Delete all sessions
             await collection.delete_all()
         else:
             # Delete a specific session
-            await collection.delete(session_id)
+            deleted = await collection.delete_by_filter(
+                {"session_id": {"$eq": session_id}},
+            )
+            logger.info(f"Deleted {deleted} messages of session {session_id}")
+
+    async def setup_history(self) -> None:
+        """Create the chat history table and its partitions, indexes are migrations."""
+        await self.client.get_or_create_collection(
+            CHAT_COLLECTION_NAME,
+            self.dimension,
+            CHAT_HISTORY_PARTITION,
+        )
+
+    async def apply_retention(self) -> None:
+        """
+        Create upcoming history partitions and expire old conversations.
+
+        On a partitioned history table expiring is a partition drop. Tables
+        created before partitioning fall back to a DELETE on the timestamp.
+        """
+        collection = await self.client.get_or_create_collection(
+            CHAT_COLLECTION_NAME,
+            self.dimension,
+            CHAT_HISTORY_PARTITION,
+        )
+        if collection.partition_by is not None:
+            await ensure_time_partitions(
+                self.client.engine,
+                CHAT_COLLECTION_NAME,
+                settings.PARTITION_PREMAKE_DAYS,
+            )
+
+        if settings.CHAT_HISTORY_RETENTION_DAYS <= 0:
+            return
+
+        if collection.partition_by is not None:
+            await drop_expired_partitions(
+                self.client.engine,
+                CHAT_COLLECTION_NAME,
+                settings.CHAT_HISTORY_RETENTION_DAYS,
+            )
+            return
+
+        logger.warning(
+            f"{CHAT_COLLECTION_NAME} is not partitioned, expiring history with DELETE",
+        )
+        cutoff = datetime.utcnow() - timedelta(
+            days=settings.CHAT_HISTORY_RETENTION_DAYS,
+        )
+        table = collection.table
+        async with self.client.session_maker() as session:
+            expired = await table.delete_by_filter(
+                session=session,
+                condition=table.payload.op("->>")("timestamp") < cutoff.isoformat(),
+            )
+        logger.info(f"Expired {expired} chat history messages")
 
     async def get_session(self, session_id: str) -> list:
         pass
@@ -51,16 +142,15 @@ class ChatService:
         """Save a single message to the chat history with embedding."""
         collection = await self.client.get_or_create_collection(
             CHAT_COLLECTION_NAME,
-            1536,
+            self.dimension,
+            CHAT_HISTORY_PARTITION,
         )
 
-        is_success, embedding, _ = embed([content])
-        if not is_success:
-            raise ValueError("Embedding failed")
+        embedding = await embed_query(content)
 
         await collection.upsert(
             id=str(uuid.uuid4()),
-            embedding=embedding[0],
+            embedding=embedding,
             payload={
                 "session_id": session_id,
                 "role": role,
@@ -69,52 +159,294 @@ class ChatService:
             },
         )
 
+    async def compact_session(self, session_id: str) -> None:
+        """
+        Fold older turns of a long session into its stored summary.
+
+        Runs as a background task after an answer is streamed. Once the turns
+        following the summary exceed CHAT_SUMMARY_TRIGGER_TOKENS, everything but
+        the last CHAT_SUMMARY_KEEP_MESSAGES messages is merged into the summary
+        and removed, so the prompt history stays bounded.
+        """
+        if not settings.CHAT_SUMMARY_ENABLED or session_id in _compacting_sessions:
+            return
+        _compacting_sessions.add(session_id)
+        try:
+            await self._compact_session(session_id)
+        except Exception as e:
+            logger.exception(f"Compacting session {session_id} failed: {e}")
+        finally:
+            _compacting_sessions.discard(session_id)
+
+    async def _compact_session(self, session_id: str) -> None:
+        collection = await self.client.get_or_create_collection(
+            CHAT_COLLECTION_NAME,
+            self.dimension,
+            CHAT_HISTORY_PARTITION,
+        )
+        records = await collection.find(
+            {"session_id": {"$eq": session_id}},
+            primary=True,
+        )
+        summary = next(
+            (r for r in records if r.payload.get("role") == SUMMARY_ROLE),
+            None,
+        )
+        turns = sorted(
+            (r for r in records if r.payload.get("role") != SUMMARY_ROLE),
+            key=lambda r: r.payload["timestamp"],
+        )
+
+        messages = [
+            {"role": r.payload["role"], "content": r.payload["content"]} for r in turns
+        ]
+        if (
+            not messages
+            or num_tokens_from_messages(messages)
+            <= settings.CHAT_SUMMARY_TRIGGER_TOKENS
+        ):
+            return
+
+        keep = max(settings.CHAT_SUMMARY_KEEP_MESSAGES, 0)
+        folded = turns[: len(turns) - keep]
+        if not folded:
+            return
+
+        conversation = "\n".join(
+            f"{r.payload['role']}: {r.payload['content']}" for r in folded
+        )
+        is_success, summary_text, usage = await chat_completion(
+            message=SUMMARY_USER_TEMPLATE.format(
+                summary=summary.payload["content"] if summary else "",
+                conversation=conversation,
+            ),
+            model=settings.CHAT_SUMMARY_MODEL,
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+        )
+        if not is_success or summary_text is None:
+            raise ValueError("Failed to summarize chat history")
+
+        embedding = await embed_query(summary_text)
+
+        # The summary takes the place of the folded turns in the timeline.
+        # It is written as a new row so it lands in the current partition.
+        await collection.upsert(
+            id=str(uuid.uuid4()),
+            embedding=embedding,
+            payload={
+                "session_id": session_id,
+                "role": SUMMARY_ROLE,
+                "content": summary_text,
+                "timestamp": folded[-1].payload["timestamp"],
+            },
+        )
+        replaced = [r.id for r in folded]
+        if summary is not None:
+            replaced.append(summary.id)
+        deleted = await collection.delete_many(replaced)
+        logger.info(
+            f"Compacted {deleted} messages of session {session_id} "
+            f"into summary, usage: {usage}",
+        )
+
     async def answer(
         self,
         query: str,
         session_id: str,
         model: str,
         dify_response: bool = False,
-    ) -> AsyncGenerator:
-        """Answer user query using RAG and stream the response as Server-Sent Events (SSE)."""
-        search_results = await self.retrieve_service.search(
-            query=query,
-            collection_name=DOCUMENT_COLLECTION_NAME,
-            top_k=self.top_k,
-            score_threshold=self.score_threshold,
-        )
-        content = "\n".join(record.content for record in search_results)
-
-        histories = await self.retrieve_service.get_chat_history(session_id)
+    ) -> AsyncGenerator[AnswerEvent, None]:
+        """Answer a query with RAG and stream the response as Server-Sent Events."""
+        start_time = time.perf_counter()
+        query_embedding: Optional[List[float]] = None
+        # Set for an opening question, whose answer is cached under it
+        cache_embedding: Optional[List[float]] = None
+        if settings.ANSWER_CACHE_ENABLED:
+            # Shared by the answer cache, the search and the context compression
+            embedding, histories = await asyncio.gather(
+                self.retrieve_service.embed_query(query),
+                self.retrieve_service.get_chat_history(session_id),
+            )
+            query_embedding = embedding
+            # Only opening questions are cached, the answer to a follow-up
+            # depends on the conversation before it
+            if not histories:
+                cache_embedding = embedding
+                cached_answer = await self._lookup_cached_answer(embedding, model)
+                if cached_answer is not None:
+                    for event in self._replay_answer(cached_answer, dify_response):
+                        yield event
+                    await self.save_chat_history(session_id, "user", query)
+                    await self.save_chat_history(
+                        session_id,
+                        "assistant",
+                        cached_answer,
+                    )
+                    return
+            search_results = await self._search(query, embedding)
+        else:
+            # Embedded by the search, so it overlaps with the history lookup.
+            # Retrieval and history lookup are independent, run them concurrently
+            search_results, histories = await asyncio.gather(
+                self._search(query, None),
+                self.retrieve_service.get_chat_history(session_id),
+            )
 
-        # Create input message
-        input_message = USER_MESSAGE_TEMPLATE.format(
-            search_results=content,
-            question=query,
+        input_message = await self._build_input_message(
+            query,
+            search_results,
+            model,
+            query_embedding,
         )
 
         # Generate answer
-        answer_generator = chat_completion_stream(
+        answer_generator = hedged_chat_completion_stream(
             message=input_message,
             model=model,
             system_prompt=SYSTEM_PROMPT,
             histories=histories,
         )
+        response_parts: List[str] = []
+        async for event in self._stream_answer(
+            answer_generator,
+            response_parts,
+            session_id,
+            model,
+            start_time,
+            dify_response,
+        ):
+            yield event
+
+        STAGE_DURATION.labels(stage="stream").observe(time.perf_counter() - start_time)
+
+        bot_response = "".join(response_parts)
+        await self.save_chat_history(session_id, "user", query)
+        await self.save_chat_history(session_id, "assistant", bot_response)
 
-        # Yield answer
-        bot_response = ""
-        for is_success, chunk, usage in answer_generator:
+        if cache_embedding is not None and bot_response:
+            await self._store_cached_answer(query, cache_embedding, model, bot_response)
+
+    async def _build_input_message(
+        self,
+        query: str,
+        search_results: List[RetrievalRecord],
+        model: str,
+        query_embedding: Optional[List[float]],
+    ) -> str:
+        """Compress and pack the retrieved chunks into the user message."""
+        if settings.CONTEXT_COMPRESSION_ENABLED:
+            with STAGE_DURATION.labels(stage="compression").time():
+                search_results = await compress_records(
+                    query,
+                    search_results,
+                    max_sentences=settings.CONTEXT_COMPRESSION_SENTENCES,
+                    scorer=settings.CONTEXT_COMPRESSION_SCORER,
+                    query_embedding=query_embedding,
+                )
+        context = pack_context(search_results, settings.CONTEXT_TOKEN_BUDGET, model)
+        CONTEXT_TOKENS.labels(stage="retrieved").inc(context.original_tokens)
+        CONTEXT_TOKENS.labels(stage="packed").inc(context.tokens)
+        logger.info(
+            f"Packed {context.chunks}/{len(search_results)} chunks into "
+            f"{context.tokens} tokens, saved {context.saved_tokens} tokens",
+        )
+        return USER_MESSAGE_TEMPLATE.format(
+            search_results=context.text,
+            question=query,
+        )
+
+    async def _stream_answer(
+        self,
+        answer_generator: ChunkStream,
+        response_parts: List[str],
+        session_id: str,
+        model: str,
+        start_time: float,
+        dify_response: bool,
+    ) -> AsyncGenerator[AnswerEvent, None]:
+        """Yield the answer events, the answer text is added to response_parts."""
+        llm_start_time = time.perf_counter()
+        # Tokens are coalesced into frames to cut per-token writes
+        frames = coalesce_chunks(
+            answer_generator,
+            max_chars=settings.STREAM_FRAME_MAX_CHARS,
+            max_delay=settings.STREAM_FRAME_MAX_DELAY_MS / 1000,
+        )
+        first_token_time = None
+        async for is_success, chunk, usage in frames:
             if not is_success:
                 raise ValueError("Failed to chat completion")
+            if first_token_time is None and chunk:
+                first_token_time = time.perf_counter() - start_time
+                ANSWER_TIME_TO_FIRST_TOKEN.labels(model=model).observe(first_token_time)
+                STAGE_DURATION.labels(stage="llm_first_token").observe(
+                    time.perf_counter() - llm_start_time,
+                )
+                logger.info(
+                    f"Session {session_id} time to first token: "
+                    f"{first_token_time:.3f}s",
+                )
+            is_text = chunk != END_OF_STREAM and chunk != USAGE_CHAR  # noqa: PLR1714
+            if is_text and chunk is not None:
+                response_parts.append(chunk)
             if dify_response:
-                if chunk != END_OF_STREAM and chunk != USAGE_CHAR:  # noqa: PLR1714
-                    bot_response += chunk
+                if is_text and chunk is not None:
                     yield chunk
             else:
-                event = json.dumps({"text": chunk, "usage": usage}, ensure_ascii=False)
-                if chunk != END_OF_STREAM and chunk != USAGE_CHAR:  # noqa: PLR1714
-                    bot_response += chunk
-                yield event + "\n"
+                yield orjson.dumps({"text": chunk, "usage": usage}) + b"\n"
 
-        await self.save_chat_history(session_id, "user", query)
-        await self.save_chat_history(session_id, "assistant", bot_response)
+    async def _search(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]],
+    ) -> List[RetrievalRecord]:
+        return await self.retrieve_service.search(
+            query=query,
+            collection_name=DOCUMENT_COLLECTION_NAME,
+            top_k=self.top_k,
+            score_threshold=self.score_threshold,
+            query_embedding=query_embedding,
+        )
+
+    async def _lookup_cached_answer(
+        self,
+        query_embedding: List[float],
+        model: str,
+    ) -> Optional[str]:
+        try:
+            return await self.answer_cache.lookup(
+                query_embedding=query_embedding,
+                collection_name=DOCUMENT_COLLECTION_NAME,
+                model=model,
+            )
+        except Exception as e:
+            logger.exception(f"Answer cache lookup failed: {e}")
+            return None
+
+    async def _store_cached_answer(
+        self,
+        query: str,
+        query_embedding: List[float],
+        model: str,
+        answer: str,
+    ) -> None:
+        try:
+            await self.answer_cache.store(
+                query=query,
+                query_embedding=query_embedding,
+                collection_name=DOCUMENT_COLLECTION_NAME,
+                model=model,
+                answer=answer,
+            )
+        except Exception as e:
+            logger.exception(f"Storing answer in cache failed: {e}")
+
+    @staticmethod
+    def _replay_answer(answer: str, dify_response: bool) -> List[AnswerEvent]:
+        """Format a cached answer like a streamed one, without calling the LLM."""
+        if dify_response:
+            return [answer]
+        return [
+            orjson.dumps({"text": text, "usage": None}) + b"\n"
+            for text in (answer, END_OF_STREAM)
+        ]
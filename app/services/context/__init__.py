@@ -0,0 +1,4 @@
+from app.services.context.compression import compress_records
+from app.services.context.packer import pack_context
+
+__all__ = ["compress_records", "pack_context"]
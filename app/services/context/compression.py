@@ -0,0 +1,133 @@
+import math
+import re
+from typing import Counter, List, Optional
+
+from app.core.settings import settings
+from app.schemas.retrieval_schema import RetrievalRecord
+from app.services.embeddings import get_embedding_provider
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Providers embedding in process, scoring sentences with them is free
+LOCAL_EMBEDDING_PROVIDERS = ("onnx", "hashing")
+
+
+def uses_embedding_scorer(scorer: str) -> bool:
+    """
+    Whether sentences are scored by embedding.
+
+    Only with a local provider: a remote one would be sent every retrieved
+    sentence on each answer, BM25 is used instead.
+    """
+    return (
+        scorer == "embedding"
+        and settings.EMBEDDING_PROVIDER in LOCAL_EMBEDDING_PROVIDERS
+    )
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_PATTERN.split(text) if s.strip()]
+
+
+def _words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def lexical_scores(query: str, sentences: List[str]) -> List[float]:
+    """BM25 score of every sentence for the query, sentences are the corpus."""
+    query_words = set(_words(query))
+    documents = [_words(s) for s in sentences]
+    if not query_words or not documents:
+        return [0.0] * len(sentences)
+
+    document_frequency: Counter[str] = Counter()
+    for words in documents:
+        document_frequency.update(query_words.intersection(words))
+    average_length = sum(len(words) for words in documents) / len(documents) or 1
+
+    scores = []
+    for words in documents:
+        frequencies = Counter(words)
+        score = 0.0
+        for word in query_words:
+            frequency = frequencies.get(word)
+            if not frequency:
+                continue
+            n = document_frequency[word]
+            idf = math.log(1 + (len(documents) - n + 0.5) / (n + 0.5))
+            norm = K1 * (1 - B + B * len(words) / average_length)
+            score += idf * frequency * (K1 + 1) / (frequency + norm)
+        scores.append(score)
+    return scores
+
+
+async def embedding_scores(
+    query: str,
+    sentences: List[str],
+    query_embedding: Optional[List[float]] = None,
+) -> List[float]:
+    """
+    Cosine similarity of every sentence to the query.
+
+    The query is embedded in the same batch as the sentences unless its
+    embedding is given.
+    """
+    texts = sentences if query_embedding is not None else [query, *sentences]
+    is_success, embeddings, _ = await get_embedding_provider().embed(texts)
+    if not is_success:
+        raise ValueError("Failed to embed sentences")
+    if query_embedding is None:
+        query_embedding, embeddings = embeddings[0], embeddings[1:]
+    query_norm = math.sqrt(sum(v * v for v in query_embedding)) or 1.0
+    scores = []
+    for embedding in embeddings:
+        dot = sum(q * e for q, e in zip(query_embedding, embedding))
+        norm = math.sqrt(sum(e * e for e in embedding)) or 1.0
+        scores.append(dot / (query_norm * norm))
+    return scores
+
+
+async def compress_records(
+    query: str,
+    records: List[RetrievalRecord],
+    max_sentences: int,
+    scorer: str = "lexical",
+    query_embedding: Optional[List[float]] = None,
+) -> List[RetrievalRecord]:
+    """
+    Keep only the sentences of each chunk that best match the query.
+
+    The top max_sentences sentences of every chunk are kept in their original
+    order. Sentences are scored with BM25 against the query, or by
+    embedding when scorer is "embedding" and the embedding provider is a
+    local one, see uses_embedding_scorer.
+    """
+    chunks = [split_sentences(r.content) for r in records]
+    sentences = [s for chunk in chunks for s in chunk]
+    if not sentences:
+        return records
+
+    if uses_embedding_scorer(scorer):
+        scores = await embedding_scores(query, sentences, query_embedding)
+    else:
+        scores = lexical_scores(query, sentences)
+
+    compressed = []
+    offset = 0
+    for record, chunk in zip(records, chunks):
+        chunk_scores = scores[offset : offset + len(chunk)]
+        offset += len(chunk)
+        if len(chunk) <= max_sentences:
+            compressed.append(record)
+            continue
+        top = sorted(
+            range(len(chunk)),
+            key=lambda i: chunk_scores[i],
+            reverse=True,
+        )[:max_sentences]
+        content = " ".join(chunk[i] for i in sorted(top))
+        compressed.append(record.model_copy(update={"content": content}))
+    return compressed
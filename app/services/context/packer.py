@@ -0,0 +1,100 @@
+import re
+from typing import List, Set
+
+from app.schemas.retrieval_schema import PackedContext, RetrievalRecord
+from app.utils.openai_connect import num_tokens
+
+# Sentences and lines, the separators are kept by the capturing group
+SEGMENT_PATTERN = re.compile(r"((?<=[.!?])\s+|\n+)")
+# Shorter segments, e.g. table separators or bullets, are never deduplicated
+MIN_DEDUP_LENGTH = 20
+# Chunk overlaps shorter than this are left alone
+MIN_OVERLAP_LENGTH = 32
+CHUNK_SEPARATOR = "\n"
+
+
+def _normalize(segment: str) -> str:
+    return " ".join(segment.lower().split())
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right."""
+    if len(right) < MIN_OVERLAP_LENGTH:
+        return 0
+    probe = right[:MIN_OVERLAP_LENGTH]
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+def _strip_overlaps(content: str, packed: List[str]) -> str:
+    """Cut the parts of a chunk that repeat the edges of packed chunks."""
+    for other in packed:
+        head = _overlap(other, content)
+        if head:
+            content = content[head:]
+        tail = _overlap(content, other)
+        if tail:
+            content = content[:-tail]
+    return content.strip()
+
+
+def _drop_seen_segments(content: str, seen: Set[str]) -> tuple:
+    """Remove sentences already packed, returns the text and its new keys."""
+    parts = SEGMENT_PATTERN.split(content)
+    kept = []
+    keys = set()
+    for segment, separator in zip(parts[::2], [*parts[1::2], ""]):
+        key = _normalize(segment)
+        if len(key) >= MIN_DEDUP_LENGTH:
+            if key in seen or key in keys:
+                continue
+            keys.add(key)
+        kept.append(segment + separator)
+    return "".join(kept).strip(), keys
+
+
+def pack_context(
+    records: List[RetrievalRecord],
+    token_budget: int,
+    model: str = "gpt-4o-mini",
+) -> PackedContext:
+    """
+    Pack retrieved chunks into a prompt context of at most token_budget tokens.
+
+    Chunks are taken in score order. Text repeated from chunks already packed,
+    the overlap between neighbouring chunks or duplicated sentences, is
+    removed first. A chunk that no longer fits is skipped so that smaller,
+    lower scored chunks can still use the rest of the budget.
+    """
+    ordered = sorted(records, key=lambda r: r.score, reverse=True)
+    original_tokens = num_tokens(
+        CHUNK_SEPARATOR.join(r.content for r in ordered),
+        model,
+    )
+    separator_tokens = num_tokens(CHUNK_SEPARATOR, model)
+
+    packed: List[str] = []
+    seen: Set[str] = set()
+    tokens = 0
+    for record in ordered:
+        content = _strip_overlaps(record.content, packed)
+        content, keys = _drop_seen_segments(content, seen)
+        if not content:
+            continue
+        cost = num_tokens(content, model) + (separator_tokens if packed else 0)
+        if tokens + cost > token_budget:
+            continue
+        packed.append(content)
+        seen |= keys
+        tokens += cost
+
+    return PackedContext(
+        text=CHUNK_SEPARATOR.join(packed),
+        tokens=tokens,
+        original_tokens=original_tokens,
+        chunks=len(packed),
+    )
@@ -1,7 +1,7 @@
 import logging
 from urllib.parse import urlparse
 
-import requests
+import httpx
 from bs4 import BeautifulSoup
 
 from app.schemas.crawl_schema import CrawlResponse
@@ -12,6 +12,7 @@ from app.services.parsers import (
     LotteMartParser,
     ShopeeParser,
 )
+from app.utils.http_client import get_crawl_client
 
 
 class CrawlService:
@@ -24,7 +25,12 @@ class CrawlService:
     async def crawl_url(self, url: str) -> CrawlResponse:
         try:
             # Fetch the webpage
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = await get_crawl_client().get(
+                url,
+                headers=self.headers,
+                timeout=30,
+                follow_redirects=True,
+            )
             response.raise_for_status()
 
             # Parse HTML
@@ -45,7 +51,7 @@ class CrawlService:
                 # Generic parser for other sites
                 return BaseParser.parse_generic(soup, url)
 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             self.logger.error(f"Error fetching URL: {e!s}")
             raise Exception(f"Error fetching URL: {e!s}") from e
         except Exception as e:
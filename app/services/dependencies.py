@@ -0,0 +1,26 @@
+from fastapi import Request
+
+from app.services.chat import ChatService
+from app.services.crawl import CrawlService
+from app.services.ingest import IngestService
+from app.services.retrieval import RetrievalService
+
+
+def get_chat_service(request: Request) -> ChatService:
+    """Return the application-scoped chat service."""
+    return request.app.state.chat_service
+
+
+def get_retrieval_service(request: Request) -> RetrievalService:
+    """Return the application-scoped retrieval service."""
+    return request.app.state.retrieval_service
+
+
+def get_ingest_service(request: Request) -> IngestService:
+    """Return the application-scoped ingest service."""
+    return request.app.state.ingest_service
+
+
+def get_crawl_service(request: Request) -> CrawlService:
+    """Return the application-scoped crawl service."""
+    return request.app.state.crawl_service
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from app.core.settings import settings
+from app.services.embeddings.base import EmbeddingProvider
+from app.services.embeddings.hashing_provider import HashingEmbeddingProvider
+from app.services.embeddings.onnx_provider import OnnxEmbeddingProvider
+from app.services.embeddings.openai_provider import OpenAIEmbeddingProvider
+
+_provider: Optional[EmbeddingProvider] = None
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Return the embedding provider selected by settings.EMBEDDING_PROVIDER."""
+    global _provider  # noqa: PLW0603
+    if _provider is None:
+        if settings.EMBEDDING_PROVIDER == "openai":
+            _provider = OpenAIEmbeddingProvider()
+        elif settings.EMBEDDING_PROVIDER == "onnx":
+            _provider = OnnxEmbeddingProvider(
+                model_path=settings.ONNX_MODEL_PATH,
+                tokenizer_path=settings.ONNX_TOKENIZER_PATH,
+                threads=settings.EMBEDDING_THREADS,
+            )
+        elif settings.EMBEDDING_PROVIDER == "hashing":
+            _provider = HashingEmbeddingProvider(settings.EMBEDDING_DIMENSION)
+        else:
+            raise ValueError(
+                f"Unknown embedding provider {settings.EMBEDDING_PROVIDER}",
+            )
+    return _provider
+
+
+__all__ = [
+    "EmbeddingProvider",
+    "HashingEmbeddingProvider",
+    "OnnxEmbeddingProvider",
+    "OpenAIEmbeddingProvider",
+    "get_embedding_provider",
+]
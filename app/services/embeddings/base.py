@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+
+class EmbeddingProvider(ABC):
+    """
+    Turns texts into vectors.
+
+    embed returns a (is_success, embeddings, usage) tuple like
+    app.utils.openai_connect.embed, so providers are interchangeable.
+    """
+
+    name: str
+    dimension: int
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> tuple:
+        """Embed a batch of texts."""
+
+    async def close(self) -> None:  # noqa: B027
+        """Release resources held by the provider, a no-op unless overridden."""
@@ -0,0 +1,45 @@
+import hashlib
+import math
+import re
+from typing import List
+
+from app.services.embeddings.base import EmbeddingProvider
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic feature-hashing embedder.
+
+    Every word and word bigram is hashed to a signed bucket and the vector
+    is L2 normalized. It needs no model and no network, which makes it
+    suitable for tests and offline runs; texts sharing words get similar
+    vectors, but there is no semantic understanding.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimension: int) -> None:
+        self.dimension = dimension
+
+    async def embed(self, texts: List[str]) -> tuple:
+        embeddings = [self.embed_text(text) for text in texts]
+        tokens = sum(len(TOKEN_PATTERN.findall(text)) for text in texts)
+        return True, embeddings, {"prompt_tokens": tokens, "total_tokens": tokens}
+
+    def embed_text(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        words = TOKEN_PATTERN.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            # Cosine distance is undefined for a zero vector
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
@@ -0,0 +1,89 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from app.services.embeddings.base import EmbeddingProvider
+
+
+class OnnxEmbeddingProvider(EmbeddingProvider):
+    """
+    Local CPU sentence embeddings from an ONNX export of a sentence model.
+
+    Works with BERT-style exports such as all-MiniLM-L6-v2 together with
+    their tokenizer.json. Inference runs in a thread pool, onnxruntime
+    releases the GIL so batches run in parallel without blocking the event
+    loop. Needs the optional onnxruntime and tokenizers packages.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer_path: str,
+        threads: int,
+        max_length: int = 256,
+    ) -> None:
+        try:
+            import numpy as np
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "The onnx embedding provider needs onnxruntime and tokenizers, "
+                "install them with `poetry install -E local-embeddings`",
+            ) from e
+
+        self._np = np
+        options = ort.SessionOptions()
+        # Parallelism comes from the thread pool, one core per inference
+        options.intra_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            model_path,
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads,
+            thread_name_prefix="onnx-embedding",
+        )
+
+    async def embed(self, texts: List[str]) -> tuple:
+        loop = asyncio.get_running_loop()
+        embeddings, tokens = await loop.run_in_executor(
+            self.executor,
+            self._embed_sync,
+            texts,
+        )
+        return True, embeddings, {"prompt_tokens": tokens, "total_tokens": tokens}
+
+    def _embed_sync(self, texts: List[str]) -> tuple:
+        np = self._np
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over the real tokens, then L2 normalization
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(
+            mask.sum(axis=1),
+            1e-9,
+            None,
+        )
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist(), int(attention_mask.sum())
+
+    async def close(self) -> None:
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,14 @@
+from typing import List
+
+from app.services.embeddings.base import EmbeddingProvider
+from app.utils.openai_connect import embed
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI text-embedding-ada-002 through the shared HTTP client pool."""
+
+    name = "openai"
+    dimension = 1536
+
+    async def embed(self, texts: List[str]) -> tuple:
+        return await embed(texts)
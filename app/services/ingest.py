@@ -1,20 +1,32 @@
 import hashlib
 import re
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from bs4 import BeautifulSoup
 from fastapi import UploadFile
 from loguru import logger
 
+from app.core.settings import settings
 from app.data_loader import read_document
 from app.db.dependencies import pg_client
+from app.db.documents import (
+    get_document_chunks,
+    lock_document_chunks,
+    save_document_chunks,
+)
+from app.db.generations import bump_generation
 from app.db.models import PgVectorCollection
+from app.db.partitions import PartitionSpec
+from app.db.routing import read_your_writes
+from app.services.embeddings import get_embedding_provider
 from app.text_splitter import split_text_into_chunks
-from app.utils.openai_connect import embed
+from app.utils.metrics import STAGE_DURATION
 
 CHUNK_SIZE = 1440
 OVERLAP_SIZE = 256
-DIMENSION = 1536
+
+# Id, text to embed and payload of a chunk
+PreparedChunk = Tuple[str, str, Dict[str, Any]]
 
 
 def clean_html_table(html: str) -> str:
@@ -22,6 +34,29 @@ def clean_html_table(html: str) -> str:
     return soup.get_text(separator=" | ")
 
 
+def chunk_id(file_name: Optional[str], text_for_embedding: str) -> str:
+    """
+    Id of a chunk, scoped to its document.
+
+    Identical text in two documents gives two chunks, so removing it from one
+    document does not remove it from the other.
+    """
+    content = f"{file_name}\n{text_for_embedding}"
+    return hashlib.md5(content.encode()).hexdigest()  # noqa: S324
+
+
+def document_partition() -> Optional[PartitionSpec]:
+    """Partitioning of new document collections, see DOCUMENT_PARTITION_*."""
+    if not settings.DOCUMENT_PARTITION_STRATEGY:
+        return None
+    return PartitionSpec(
+        strategy=settings.DOCUMENT_PARTITION_STRATEGY,
+        column=settings.DOCUMENT_PARTITION_FIELD,
+        modulus=settings.DOCUMENT_PARTITION_COUNT,
+        values=settings.DOCUMENT_PARTITION_VALUES,
+    )
+
+
 def extract_title_from_sections(sections: List[str]) -> Optional[str]:
     for line in sections:
         match = re.match(r"#\s*(.+)", line)
@@ -40,11 +75,21 @@ class IngestService:
         collection_name: str,
         files: List[UploadFile],
     ) -> None:
-        for file in files:
-            await self.ingest_single(collection_name, file)
+        try:
+            # Documents are diffed against what is written, not a lagging replica
+            with read_your_writes():
+                for file in files:
+                    await self.ingest_single(collection_name, file)
+        finally:
+            # Answers generated from the previous content are now stale
+            await bump_generation(self.client.session_maker, collection_name)
 
     async def ingest_single(self, collection_name: str, file: UploadFile) -> None:
-        sections, tables = self.parse_document(file)
+        # Rejected with a 400 by the ingest view already
+        if not file.filename:
+            raise ValueError("Uploaded file has no name")
+        file_name = file.filename
+        sections, tables = await self.parse_document(file)
         doc_title = extract_title_from_sections(sections)
 
         data_chunks = {
@@ -58,30 +103,29 @@ class IngestService:
             OVERLAP_SIZE,
         )
 
-        if section_texts:
-            await self.insert_data(
-                collection_name,
-                DIMENSION,
-                section_texts,
-                "section",
-                file.filename,
-                doc_title,
-            )
-        if table_texts:
-            await self.insert_data(
-                collection_name,
-                DIMENSION,
-                table_texts,
-                "table",
-                file.filename,
-                doc_title,
-            )
+        chunks = self.prepare_chunks(
+            section_texts,
+            "section",
+            file_name,
+            doc_title,
+        ) + self.prepare_chunks(table_texts, "table", file_name, doc_title)
+        await self.sync_document(
+            collection_name,
+            get_embedding_provider().dimension,
+            file_name,
+            chunks,
+        )
 
-    def parse_document(self, file: UploadFile) -> str:
-        sections, tables = read_document(file)
+    async def parse_document(self, file: UploadFile) -> Tuple[List[str], List[str]]:
+        sections, tables = await read_document(file)
         return sections, tables
 
-    def chunking(self, data_chunks: dict, chunk_size: int, overlap_size: int) -> str:
+    def chunking(
+        self,
+        data_chunks: Dict[str, List[str]],
+        chunk_size: int,
+        overlap_size: int,
+    ) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
         section_texts, table_texts = split_text_into_chunks(
             data_chunks,
             chunk_size,
@@ -89,17 +133,14 @@ class IngestService:
         )
         return section_texts, table_texts
 
-    async def insert_data(
+    def prepare_chunks(
         self,
-        collection_name: str,
-        dimension: int,
-        data: list,
+        data: List[Dict[str, Any]],
         data_type: str,
         file_name: Optional[str] = None,
         title_from_doc: Optional[str] = None,
-    ) -> None:
-        collection = await self.get_collection(collection_name, dimension)
-
+    ) -> List[PreparedChunk]:
+        """Id, text to embed and payload of each chunk of a document."""
         title_pattern = re.compile(r"#\s*(.+)")
         extracted_title = None
         for chunk in data:
@@ -108,48 +149,119 @@ class IngestService:
                 extracted_title = match.group(1).strip()
                 break
 
+        prepared = []
         for chunk in data:
             text_content = chunk["chunk"]
-            chunk_id = hashlib.md5(text_content.encode()).hexdigest()  # noqa: S324
-
-            try:
-                existing_record = await collection.get(chunk_id)
-            except ValueError:
-                existing_record = None
-
-            if existing_record is None:
-                # Làm sạch bảng nếu cần
-                if data_type == "table":
-                    text_content_clean = clean_html_table(text_content)
-                else:
-                    text_content_clean = text_content
-
-                # Dùng title từ chunk, nếu không có thì fallback từ doc
-                title = (
-                    extracted_title or title_from_doc or f"{data_type} from {file_name}"
-                )
 
-                # Gộp title + content để embedding
-                text_for_embedding = f"{title}\n{text_content_clean}"
-
-                is_success, embeddings, usage = embed([text_for_embedding])
-                if not is_success:
-                    raise ValueError("Failed to embed chunk")
-
-                payload = {
-                    "content": text_content,
-                    "type": data_type,
-                    "source": file_name,
-                    "title": title,
-                }
-                if "metadata" in chunk:
-                    payload.update(chunk["metadata"])
-
-                await collection.upsert(
-                    id=chunk_id,
-                    embedding=embeddings[0],
-                    payload=payload,
+            # Làm sạch bảng nếu cần
+            if data_type == "table":
+                text_content_clean = clean_html_table(text_content)
+            else:
+                text_content_clean = text_content
+
+            # Dùng title từ chunk, nếu không có thì fallback từ doc
+            title = extracted_title or title_from_doc or f"{data_type} from {file_name}"
+
+            # Gộp title + content để embedding
+            text_for_embedding = f"{title}\n{text_content_clean}"
+
+            payload = {
+                "content": text_content,
+                "type": data_type,
+                "source": file_name,
+                "title": title,
+            }
+            if "metadata" in chunk:
+                payload.update(chunk["metadata"])
+
+            prepared.append(
+                (chunk_id(file_name, text_for_embedding), text_for_embedding, payload),
+            )
+        return prepared
+
+    async def sync_document(
+        self,
+        collection_name: str,
+        dimension: int,
+        file_name: str,
+        chunks: List[PreparedChunk],
+    ) -> None:
+        """
+        Bring the chunks of a document in line with its new version.
+
+        The chunk ids are diffed against the ones recorded for the document:
+        only added chunks are embedded, and the added chunks, the deletion of
+        the removed ones and the new record are committed together.
+        """
+        collection = await self.get_collection(collection_name, dimension)
+        # The same chunk may appear twice in a document
+        chunks_by_id = {chunk[0]: chunk for chunk in chunks}
+
+        stored_ids = await get_document_chunks(
+            self.client.session_maker,
+            collection_name,
+            file_name,
+        )
+        if stored_ids is None:
+            # Chunks written before the document registry existed
+            stored_ids = set(
+                await collection.find_ids(
+                    {"source": {"$eq": file_name}},
+                    primary=True,
+                ),
+            )
+        added = [chunks_by_id[i] for i in chunks_by_id.keys() - stored_ids]
+        # Embedded before the transaction, which stays short
+        embeddings = await self.embed_chunks(added)
+
+        async with collection.transaction() as connection:
+            locked_ids = await lock_document_chunks(
+                connection,
+                collection_name,
+                file_name,
+            )
+            # Another ingest of the document may have committed meanwhile and
+            # removed chunks that were not embedded as they already existed
+            if locked_ids is not None and locked_ids != stored_ids:
+                missing = [
+                    chunks_by_id[i]
+                    for i in (chunks_by_id.keys() & stored_ids) - locked_ids
+                ]
+                added += missing
+                embeddings += await self.embed_chunks(missing)
+                stored_ids = locked_ids
+            removed = list(stored_ids - chunks_by_id.keys())
+            await collection.upsert_many(
+                ids=[chunk_id for chunk_id, _, _ in added],
+                embeddings=embeddings,
+                payloads=[payload for _, _, payload in added],
+                connection=connection,
+            )
+            await collection.delete_many(removed, connection=connection)
+            await save_document_chunks(
+                connection,
+                collection_name,
+                file_name,
+                set(chunks_by_id),
+            )
+        logger.info(
+            f"{file_name}: {len(added)} chunks added, {len(removed)} removed, "
+            f"{len(chunks_by_id) - len(added)} unchanged",
+        )
+
+    async def embed_chunks(self, chunks: List[PreparedChunk]) -> List[List[float]]:
+        """Embed the texts of prepared chunks in batches."""
+        embeddings = []
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start : start + self.batch_size]
+            with STAGE_DURATION.labels(stage="embedding").time():
+                is_success, batch_embeddings, _ = await get_embedding_provider().embed(
+                    [text for _, text, _ in batch],
                 )
+            if not is_success:
+                raise ValueError("Failed to embed chunk")
+            embeddings.extend(batch_embeddings)
+        return embeddings
 
     async def get_collection(
         self,
@@ -160,6 +272,7 @@ class IngestService:
             return await self.client.get_or_create_collection(
                 collection_name,
                 dimension,
+                document_partition(),
             )
         except Exception as e:
             logger.exception(e)
@@ -174,3 +174,32 @@ Relevant search results:
 User's response:
 <question>{question}</question>
 """
+
+SUMMARY_SYSTEM_PROMPT = """
+You maintain a running summary of a sales conversation between a customer and \
+the Vimo sales consultant.
+Merge the previous summary with the new conversation turns into one updated summary.
+Keep: the customer's needs, products they asked about or were recommended, prices \
+and offers mentioned, their current buying stage, and any open questions.
+Drop greetings, filler and repeated information.
+Write at most 200 words, in the same language as the conversation.
+"""
+
+SUMMARY_USER_TEMPLATE = """
+Previous summary:
+<summary>
+{summary}
+</summary>
+
+New conversation turns:
+<conversation>
+{conversation}
+</conversation>
+"""
+
+CONVERSATION_SUMMARY_TEMPLATE = """
+Summary of the earlier conversation with this customer:
+<summary>
+{summary}
+</summary>
+"""
@@ -1,13 +1,27 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
+import orjson
 from loguru import logger
 from sqlalchemy import text
 
 from app.core.settings import settings
 from app.db.dependencies import pg_client
+from app.db.documents import forget_documents
+from app.db.generations import bump_generation
 from app.db.models import PgVectorCollection
+from app.db.partitions import PartitionSpec
 from app.schemas.retrieval_schema import RetrievalRecord
-from app.utils.openai_connect import embed
+from app.services.embeddings import get_embedding_provider
+from app.services.prompts import CONVERSATION_SUMMARY_TEMPLATE
+from app.utils.embedding_batcher import embed_query
+from app.utils.http_client import get_http_client
+from app.utils.metrics import STAGE_DURATION
+
+# Role of the stored message that replaces compacted chat turns
+SUMMARY_ROLE = "summary"
+
+# Chat history is partitioned by day so that expiring it is a partition drop
+CHAT_HISTORY_PARTITION = PartitionSpec(strategy="range", column="created_at")
 
 
 class RetrievalService:
@@ -31,23 +45,22 @@ class RetrievalService:
         top_k: int = 5,
         score_threshold: float = 0.5,
         filter_source: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
     ) -> List[RetrievalRecord]:
         """Perform semantic vector search using embedding and score filtering."""
         collection = await self.get_collection(collection_name)
-        is_success, query_embedding, usage = embed([query])
-
-        logger.info(f"Embedding usage: {usage}")
-        if not is_success:
-            raise ValueError("Failed to embed query")
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query)
 
         try:
-            results = await collection.query(
-                query=query_embedding[0],
-                limit=top_k,
-                filter_dict={"source": {"$eq": filter_source}}
-                if filter_source
-                else None,
-            )
+            with STAGE_DURATION.labels(stage="vector_query").time():
+                results = await collection.query(
+                    query=query_embedding,
+                    limit=top_k,
+                    filter_dict={"source": {"$eq": filter_source}}
+                    if filter_source
+                    else None,
+                )
             return [
                 RetrievalRecord(
                     content=record.payload.payload["content"],
@@ -64,52 +77,113 @@ class RetrievalService:
             logger.exception("Unhandled exception", exc_info=e)
             raise e from None
 
-    async def get_all_chunks(self, collection_name: str) -> List[RetrievalRecord]:
-        """Retrieve all chunks from a given collection."""
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a search query, batched with concurrent queries."""
+        return await embed_query(query)
+
+    async def export_chunks(
+        self,
+        collection_name: str,
+        after_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_embeddings: bool = False,
+    ) -> AsyncIterator[bytes]:
+        """
+        NDJSON lines of the chunks of a collection, ordered by id.
+
+        The collection is looked up before streaming starts, so a missing one
+        fails the request instead of an already started response.
+        """
+        collection = await self.get_collection(collection_name)
+        return self._export_lines(collection, after_id, limit, include_embeddings)
+
+    async def _export_lines(
+        self,
+        collection: PgVectorCollection,
+        after_id: Optional[str],
+        limit: Optional[int],
+        include_embeddings: bool,
+    ) -> AsyncIterator[bytes]:
+        rows = collection.export(
+            after_id=after_id,
+            limit=limit,
+            include_embedding=include_embeddings,
+        )
+        async for row in rows:
+            # The payload is already JSON text, it is passed through as is
+            line = {"id": row["id"], "payload": orjson.Fragment(row["payload"])}
+            if include_embeddings:
+                line["embedding"] = row["embedding"]
+            yield orjson.dumps(
+                line,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE,
+            )
+
+    async def delete_all_chunks(self, collection_name: str) -> None:
+        """Delete all chunks of a collection with TRUNCATE, without counting them."""
         collection = await self.get_collection(collection_name)
         try:
-            return await collection.query_all()
+            await collection.delete_all()
+            await forget_documents(self.client.session_maker, collection_name)
+            await bump_generation(self.client.session_maker, collection_name)
         except Exception as e:
-            logger.exception(e)
+            logger.exception(f"Error deleting all chunks: {e}")
             raise e
 
-    async def delete_all_chunks(self, collection_name: str) -> int:
-        """Delete all chunks from a given collection and return the count of deleted items."""
+    async def delete_source_chunks(self, collection_name: str, source: str) -> int:
+        """
+        Delete the chunks of one source document, return how many were deleted.
+
+        Uses the index on the source payload field, or only touches the
+        source's partition when the collection is partitioned by source.
+        """
         collection = await self.get_collection(collection_name)
         try:
-            # Get all records to count them
-            records = await collection.query_all()
-            deleted_count = len(records)
-
-            # Delete all records using a SQL DELETE statement
-            async with self.client.session_maker() as session:
-                await session.execute(
-                    text(f"DELETE FROM {settings.DB_VECTOR_SCHEMA}.{collection_name}")
-                )
-                await session.commit()
-
+            deleted_count = await collection.delete_by_filter(
+                {"source": {"$eq": source}},
+            )
+            await forget_documents(self.client.session_maker, collection_name, source)
+            if deleted_count:
+                await bump_generation(self.client.session_maker, collection_name)
             return deleted_count
         except Exception as e:
-            logger.exception(f"Error deleting all chunks: {e}")
+            logger.exception(f"Error deleting chunks of {source}: {e}")
             raise e
 
     async def get_chat_history(self, session_id: str) -> list:
         """
-        Retrieve all messages for a given session_id and sort them by timestamp.
+        Retrieve the prompt history for a given session_id.
+
+        Older turns that were compacted are represented by the stored summary,
+        which is returned first as a system message.
 
         Returns:
             A list of message dicts: [{"role": ..., "content": ...}, ...]
         """
         collection = await self.client.get_or_create_collection(
-            "vimo_chat_history", 1536
+            "vimo_chat_history",
+            get_embedding_provider().dimension,
+            CHAT_HISTORY_PARTITION,
         )
         try:
-            records = await collection.query_all()
-            messages = [
-                r.payload for r in records if r.payload.get("session_id") == session_id
-            ]
+            # The turn just stored must be part of the history
+            records = await collection.find(
+                {"session_id": {"$eq": session_id}},
+                primary=True,
+            )
+            messages = [r.payload for r in records]
             messages.sort(key=lambda x: x["timestamp"])
-            return [{"role": m["role"], "content": m["content"]} for m in messages]
+            return [
+                {
+                    "role": "system",
+                    "content": CONVERSATION_SUMMARY_TEMPLATE.format(
+                        summary=m["content"],
+                    ),
+                }
+                if m["role"] == SUMMARY_ROLE
+                else {"role": m["role"], "content": m["content"]}
+                for m in messages
+            ]
         except Exception:
             return []
 
@@ -120,6 +194,7 @@ class RetrievalService:
         top_k: int = 5,
     ) -> List[RetrievalRecord]:
         """Perform keyword-based search using PostgreSQL full-text search."""
+        collection = await self.get_collection(table_name)
         sql = f"""
         SELECT id,
                payload->>'content' AS content,
@@ -130,22 +205,24 @@ class RetrievalService:
                    to_tsvector('english', payload->>'content'),
                    websearch_to_tsquery('english', :q)
                ) AS rank
-        FROM {settings.DB_VECTOR_SCHEMA}.{table_name}
+        FROM {collection.table_uri}
         WHERE to_tsvector('english', payload->>'content') @@ websearch_to_tsquery('english', :q)
         ORDER BY rank DESC
         LIMIT :limit
         """  # noqa: E501, S608
 
-        async with self.client.session_maker() as session:
-            result = await session.execute(text(sql), {"q": query, "limit": top_k})
-            rows = result.fetchall()
+        with STAGE_DURATION.labels(stage="keyword_query").time():
+            # The replica, unless the request reads its own writes
+            async with collection.reader()() as session:
+                result = await session.execute(text(sql), {"q": query, "limit": top_k})
+                rows = result.fetchall()
 
         return [
             RetrievalRecord(
-                content=row[0],
-                title=row[1],
-                source=row[2],
-                type=row[3],
+                content=row.content,
+                title=row.title,
+                source=row.source,
+                type=row.type,
                 score=1.0,
                 search_type="keyword",
             )
@@ -222,23 +299,28 @@ class RetrievalService:
         top_n: int = 5,
     ) -> List[RetrievalRecord]:
         """Re-rank retrieved records using Cohere re-rank model for better relevance."""
-        from cohere import Client
-
-        co = Client(settings.COHERE_API_KEY)
+        if not records:
+            return records
 
         try:
             documents = [r.content for r in records]
-            reranked = co.rerank(
-                query=query,
-                documents=documents,
-                model="rerank-english-v3.0",
-                top_n=top_n,
-            )
+            with STAGE_DURATION.labels(stage="rerank").time():
+                response = await get_http_client(settings.COHERE_BASE_URL).post(
+                    f"{settings.COHERE_BASE_URL}/v1/rerank",
+                    headers={"Authorization": f"Bearer {settings.COHERE_API_KEY}"},
+                    json={
+                        "query": query,
+                        "documents": documents,
+                        "model": "rerank-english-v3.0",
+                        "top_n": top_n,
+                    },
+                )
+            response.raise_for_status()
 
             results = []
-            for r in reranked.results:
-                rec = records[r.index]
-                rec.score = r.relevance_score
+            for r in response.json()["results"]:
+                rec = records[r["index"]]
+                rec.score = r["relevance_score"]
                 results.append(rec)
 
             return sorted(results, key=lambda r: r.score, reverse=True)
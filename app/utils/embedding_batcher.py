@@ -0,0 +1,101 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.core.settings import settings
+from app.services.embeddings import get_embedding_provider
+from app.utils.metrics import EMBEDDING_BATCH_SIZE, STAGE_DURATION
+
+# A text to embed and the future of its caller
+Waiter = Tuple[str, "asyncio.Future[List[float]]"]
+
+
+class EmbeddingCoalescer:
+    """
+    Micro-batcher for single-text embedding requests.
+
+    Texts requested within max_wait of each other are sent as one batched
+    embeddings call, and each caller gets its own vector back. A batch is
+    sent early once it reaches max_batch_size.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait: float) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Waiter] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task[None]] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed one text as part of the next batch."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._embed_batch(batch))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _embed_batch(self, batch: List[Waiter]) -> None:
+        # Callers wait on their future, so every one of them is resolved here
+        try:
+            await self._resolve_batch(batch)
+        except Exception as e:
+            logger.exception(f"Batched embedding failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Cancelled with the loop
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    async def _resolve_batch(self, batch: List[Waiter]) -> None:
+        # Identical texts in a batch are embedded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        with STAGE_DURATION.labels(stage="embedding").time():
+            is_success, embeddings, usage = await get_embedding_provider().embed(
+                texts,
+            )
+        if not is_success:
+            raise ValueError("Failed to embed query")
+        if len(embeddings) != len(texts):
+            raise ValueError(
+                f"Got {len(embeddings)} embeddings for a batch of {len(texts)} texts",
+            )
+
+        logger.info(f"Embedded batch of {len(texts)} texts, usage: {usage}")
+        by_text: Dict[str, List[float]] = dict(zip(texts, embeddings))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+
+_coalescer: Optional[EmbeddingCoalescer] = None
+
+
+async def embed_query(text: str) -> List[float]:
+    """Embed a single text, coalesced with concurrent requests."""
+    global _coalescer  # noqa: PLW0603
+    if _coalescer is None:
+        _coalescer = EmbeddingCoalescer(
+            max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+            max_wait=settings.EMBED_BATCH_MAX_WAIT_MS / 1000,
+        )
+    return await _coalescer.embed(text)
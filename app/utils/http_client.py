@@ -0,0 +1,114 @@
+from importlib.util import find_spec
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+from loguru import logger
+
+from app.core.settings import settings
+from app.utils.metrics import HTTP_CONNECTIONS_OPENED, HTTP_REQUESTS
+
+# Host label of the requests of the crawl client, whatever the crawled host
+CRAWL_HOST_LABEL = "crawl"
+
+
+class HTTPClientPool:
+    """
+    Pooled keep-alive async HTTP clients, one per upstream host.
+
+    Clients are created on first use and live until the pool is closed,
+    so every request to the same host reuses its open connections. Only
+    the configured upstream APIs get their own client, user-supplied URLs
+    share the single crawl client so clients and metric labels stay bounded.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._crawl_client: Optional[httpx.AsyncClient] = None
+        self.limits = httpx.Limits(
+            max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY,
+        )
+        self.timeout = httpx.Timeout(
+            settings.HTTP_TIMEOUT_SECONDS,
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        )
+        # HTTP/2 needs the optional h2 package
+        self.http2 = settings.HTTP2_ENABLED and find_spec("h2") is not None
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        """Return the client for the host of the given URL."""
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = self._create_client(parsed.netloc)
+            self._clients[origin] = client
+        return client
+
+    def crawler(self) -> httpx.AsyncClient:
+        """Return the client shared by all crawled URLs."""
+        if self._crawl_client is None or self._crawl_client.is_closed:
+            self._crawl_client = self._create_client(CRAWL_HOST_LABEL)
+        return self._crawl_client
+
+    def _create_client(self, host: str) -> httpx.AsyncClient:
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                HTTP_CONNECTIONS_OPENED.labels(host=host).inc()
+
+        async def on_request(request: httpx.Request) -> None:
+            HTTP_REQUESTS.labels(host=host).inc()
+            request.extensions["trace"] = trace
+
+        logger.info(f"Creating HTTP client for {host} (http2={self.http2})")
+        return httpx.AsyncClient(
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=self.http2,
+            event_hooks={"request": [on_request]},
+        )
+
+    async def aclose(self) -> None:
+        """Close every client of the pool."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        if self._crawl_client is not None:
+            await self._crawl_client.aclose()
+            self._crawl_client = None
+
+
+_pool: Optional[HTTPClientPool] = None
+
+
+def init_http_clients() -> HTTPClientPool:
+    """Create the application-wide pool, called on startup."""
+    global _pool  # noqa: PLW0603
+    _pool = HTTPClientPool()
+    return _pool
+
+
+async def close_http_clients() -> None:
+    """Close the application-wide pool, called on shutdown."""
+    if _pool is not None:
+        await _pool.aclose()
+
+
+def _get_pool() -> HTTPClientPool:
+    global _pool  # noqa: PLW0603
+    if _pool is None:
+        # Used outside of the application lifespan, e.g. from scripts
+        _pool = HTTPClientPool()
+    return _pool
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """Return the pooled client for the host of a configured upstream API."""
+    return _get_pool().get(url)
+
+
+def get_crawl_client() -> httpx.AsyncClient:
+    """Return the client shared by all crawled, user-supplied URLs."""
+    return _get_pool().crawler()
@@ -0,0 +1,131 @@
+import asyncio
+from contextlib import suppress
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.settings import settings
+from app.utils.metrics import LLM_HEDGE_EVENTS
+from app.utils.openai_connect import (
+    DEFAULT_PROMPT,
+    ChatMessage,
+    ChunkStream,
+    StreamChunk,
+    chat_completion_stream,
+)
+
+
+async def _first(generator: ChunkStream) -> StreamChunk:
+    return await generator.__anext__()
+
+
+async def _cancel(task: asyncio.Task[StreamChunk], generator: ChunkStream) -> None:
+    """Cancel a losing request and release its connection."""
+    task.cancel()
+    with suppress(asyncio.CancelledError, Exception):
+        await task
+    with suppress(Exception):
+        await generator.aclose()
+
+
+async def _hedge(
+    primary: ChunkStream,
+    primary_first: asyncio.Task[StreamChunk],
+    hedge: ChunkStream,
+    model: str,
+) -> Tuple[ChunkStream, StreamChunk]:
+    """Race a hedge request against the primary, return the winner and its chunk."""
+    LLM_HEDGE_EVENTS.labels(event="hedged").inc()
+    logger.info(
+        f"No first chunk from {model} after {settings.LLM_HEDGE_DELAY_MS}ms, "
+        f"hedging with {settings.LLM_HEDGE_PROVIDER}",
+    )
+    hedge_first = asyncio.create_task(_first(hedge))
+    candidates: Dict[asyncio.Task[StreamChunk], ChunkStream] = {
+        primary_first: primary,
+        hedge_first: hedge,
+    }
+
+    while candidates:
+        done, _ = await asyncio.wait(
+            candidates,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        task = done.pop()
+        generator = candidates.pop(task)
+        try:
+            first_result = task.result()
+        except Exception as e:
+            logger.warning(f"Hedged request failed: {e}")
+            first_result = (False, None, None)
+        winner = generator
+        # A failed request only wins when the other one failed as well
+        if first_result[0] or not candidates:
+            break
+
+    for task, generator in candidates.items():
+        await _cancel(task, generator)
+    if not first_result[0]:
+        event = "failed"
+    elif winner is hedge:
+        event = "hedge_win"
+    else:
+        event = "primary_win"
+    LLM_HEDGE_EVENTS.labels(event=event).inc()
+    return winner, first_result
+
+
+async def hedged_chat_completion_stream(
+    message: str,
+    language: str = "en",
+    model: str = "gpt-4o-mini",
+    system_prompt: str = DEFAULT_PROMPT,
+    histories: Optional[List[ChatMessage]] = None,
+) -> ChunkStream:
+    """
+    Chat completion stream with an optional hedge request.
+
+    When LLM_HEDGE_ENABLED is set and the primary request has not produced
+    its first chunk after LLM_HEDGE_DELAY_MS, a second request is sent to
+    LLM_HEDGE_PROVIDER/LLM_HEDGE_MODEL. Whichever streams a chunk first is
+    used and the other one is cancelled.
+    """
+    primary = chat_completion_stream(
+        message=message,
+        language=language,
+        model=model,
+        system_prompt=system_prompt,
+        histories=histories,
+    )
+    if not settings.LLM_HEDGE_ENABLED:
+        async for result in primary:
+            yield result
+        return
+
+    LLM_HEDGE_EVENTS.labels(event="request").inc()
+    primary_first = asyncio.create_task(_first(primary))
+    done, _ = await asyncio.wait(
+        {primary_first},
+        timeout=settings.LLM_HEDGE_DELAY_MS / 1000,
+    )
+
+    if done:
+        winner = primary
+        try:
+            first_result = primary_first.result()
+        except StopAsyncIteration:
+            return
+    else:
+        hedge = chat_completion_stream(
+            message=message,
+            language=language,
+            model=settings.LLM_HEDGE_MODEL or model,
+            system_prompt=system_prompt,
+            histories=histories,
+            provider=settings.LLM_HEDGE_PROVIDER,
+        )
+        winner, first_result = await _hedge(primary, primary_first, hedge, model)
+
+    yield first_result
+    async for result in winner:
+        yield result
@@ -0,0 +1,112 @@
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+ANSWER_CACHE_EVENTS = Counter(
+    "vimo_answer_cache_events_total",
+    "Semantic answer cache lookups and evictions.",
+    ["event"],
+)
+
+ANSWER_TIME_TO_FIRST_TOKEN = Histogram(
+    "vimo_answer_time_to_first_token_seconds",
+    "Time from the start of an answer request to its first streamed token.",
+    ["model"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8, 13),
+)
+
+HTTP_REQUESTS = Counter(
+    "vimo_http_client_requests_total",
+    "Requests sent to upstream APIs through the shared client pool.",
+    ["host"],
+)
+
+HTTP_CONNECTIONS_OPENED = Counter(
+    "vimo_http_client_connections_opened_total",
+    "New connections opened to upstream APIs; requests minus this were reused.",
+    ["host"],
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "vimo_embedding_batch_size",
+    "Number of texts per coalesced embedding request.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+LLM_HEDGE_EVENTS = Counter(
+    "vimo_llm_hedge_events_total",
+    "Hedged chat completions: requests, hedges sent, which one won or failed.",
+    ["event"],
+)
+
+# Stages of a request: embedding, vector_query, keyword_query, rerank,
+# compression, llm_first_token and stream
+STAGE_DURATION = Histogram(
+    "vimo_stage_duration_seconds",
+    "Duration of the retrieval and generation stages of a request.",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+LLM_TOKENS = Counter(
+    "vimo_llm_tokens_total",
+    "Tokens billed by upstream model APIs.",
+    ["model", "kind"],
+)
+
+CONTEXT_TOKENS = Counter(
+    "vimo_context_tokens_total",
+    "Tokens of retrieved context before and after packing into the prompt.",
+    ["stage"],
+)
+
+# Summed over the live gunicorn workers when metrics are multiprocess
+DB_POOL_CONNECTIONS = Gauge(
+    "vimo_db_pool_connections",
+    "Database connections of the pool: capacity, open and checked out.",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    "vimo_db_pool_checkouts_total",
+    "Connections checked out of the database pool.",
+    ["pool"],
+)
+
+
+def record_token_usage(model: str, usage: Optional[Dict[str, Any]]) -> None:
+    """Count the tokens of an OpenAI-style usage object."""
+    if not usage:
+        return
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    if prompt_tokens:
+        LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+
+
+def instrument_pool(engine: AsyncEngine, capacity: int, name: str) -> None:
+    """Track the connections of the engine's pool, labelled primary or replica."""
+    pool = engine.sync_engine.pool
+    DB_POOL_CONNECTIONS.labels(pool=name, state="capacity").inc(capacity)
+
+    @event.listens_for(pool, "connect")
+    def on_connect(*args: Any) -> None:
+        DB_POOL_CONNECTIONS.labels(pool=name, state="open").inc()
+
+    @event.listens_for(pool, "close")
+    def on_close(*args: Any) -> None:
+        DB_POOL_CONNECTIONS.labels(pool=name, state="open").dec()
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(*args: Any) -> None:
+        DB_POOL_CONNECTIONS.labels(pool=name, state="checked_out").inc()
+        DB_POOL_CHECKOUTS.labels(pool=name).inc()
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(*args: Any) -> None:
+        DB_POOL_CONNECTIONS.labels(pool=name, state="checked_out").dec()
@@ -1,14 +1,23 @@
+import asyncio
 import json
 import os
 import time
-from typing import Generator, Optional
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
-import requests
+import httpx
+import orjson
 import tiktoken
 from loguru import logger
 
+from app.core.settings import settings
+from app.utils import rate_limit
+from app.utils.http_client import get_http_client
+from app.utils.metrics import record_token_usage
+from app.utils.rate_limit import estimate_tokens, is_retryable, retry_delay
+
 # OpenAI API key
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com")
 END_OF_STREAM = ""
 USAGE_CHAR = ""
@@ -17,18 +26,41 @@ if OPENAI_BASE_URL.endswith("/"):
     OPENAI_BASE_URL = OPENAI_BASE_URL[:-1]
 
 if not OPENAI_API_KEY:
-    logger.error("OpenAI API key is not set, please set it to environment variable")
-    raise Exception("OpenAI API key is not set, please set it to environment variable")
+    # Local embedding providers work without a key, OpenAI calls will fail
+    logger.warning("OpenAI API key is not set, OpenAI requests will fail")
 
 DEFAULT_PROMPT = "You are a helpful assistant"
+EMBEDDING_MODEL = "text-embedding-ada-002"
 OPENAI_TIMEOUT_SECONDS = 20
 
+# A chat message, {"role": ..., "content": ...}
+ChatMessage = Dict[str, str]
+# Token usage of a request as reported by the API
+Usage = Dict[str, Any]
+# (is_success, content, usage) items of a completion stream
+StreamChunk = Tuple[bool, Optional[str], Optional[Usage]]
+ChunkStream = AsyncGenerator[StreamChunk, None]
+
 MAX_TOKENS = {
     "en": 4096,
     "vi": 8192,
 }
 
 
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Return the tokenizer of a model, o200k_base for unknown models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def num_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Return the number of tokens of a plain text."""
+    return len(get_encoding(model).encode(text))
+
+
 # https://github.com/openai/openai-cookbook/blob/683e5f5a71bc7a1b0e5b7a35e087f53cc55fceea/examples/How_to_count_tokens_with_tiktoken.ipynb
 def num_tokens_from_messages(
     messages: list,
@@ -126,7 +158,10 @@ def reduce_messages(
     return history_messages
 
 
-def embed(texts: list, retried: int = 3) -> tuple:
+async def embed(
+    texts: List[str],
+    retried: int = 3,
+) -> Tuple[bool, Optional[List[List[float]]], Optional[Usage]]:
     """Embed texts using OpenAI API."""
 
     headers = {
@@ -134,46 +169,117 @@ def embed(texts: list, retried: int = 3) -> tuple:
         "Authorization": "Bearer " + OPENAI_API_KEY,
     }
     data = {
-        "model": "text-embedding-ada-002",
+        "model": EMBEDDING_MODEL,
         "input": [t.lower() for t in texts],
     }
-    try:
-        start_time = time.time()
-        response = requests.post(
-            f"{OPENAI_BASE_URL}/v1/embeddings",
-            headers=headers,
-            data=json.dumps(data),
-            timeout=OPENAI_TIMEOUT_SECONDS,
-        )
-        logger.info(
-            f"Embedding {len(texts)} chunks cost {time.time() - start_time}s",
-        )
-        if response.status_code == 200:
-            result = response.json()
-            return True, [x["embedding"] for x in result["data"]], result["usage"]
-        raise Exception(
-            f"Embedding got status code {response.status_code}: {response.text}",
+    for attempt in range(retried + 1):
+        await rate_limit.acquire(EMBEDDING_MODEL, estimate_tokens(*texts))
+        response = None
+        try:
+            start_time = time.time()
+            response = await get_http_client(OPENAI_BASE_URL).post(
+                f"{OPENAI_BASE_URL}/v1/embeddings",
+                headers=headers,
+                content=json.dumps(data),
+                timeout=OPENAI_TIMEOUT_SECONDS,
+            )
+            logger.info(
+                f"Embedding {len(texts)} chunks cost {time.time() - start_time}s",
+            )
+            if response.status_code == 200:
+                result = response.json()
+                record_token_usage(EMBEDDING_MODEL, result["usage"])
+                return True, [x["embedding"] for x in result["data"]], result["usage"]
+            logger.error(
+                f"Embedding got status code {response.status_code}: {response.text}",
+            )
+            if not is_retryable(response.status_code):
+                break
+        except httpx.HTTPError as e:
+            logger.exception(f"OpenAI embedding failed: {e}")
+        if attempt < retried:
+            delay = retry_delay(attempt, response)
+            logger.warning(f"OpenAI embedding failed, retrying in {delay:.2f}s...")
+            await asyncio.sleep(delay)
+    logger.error("OpenAI embedding failed, give up.")
+    return False, None, None
+
+
+async def chat_completion(
+    message: str,
+    model: str = "gpt-4o-mini",
+    system_prompt: str = DEFAULT_PROMPT,
+    histories: Optional[List[ChatMessage]] = None,
+    retried: int = 1,
+) -> Tuple[bool, Optional[str], Optional[Usage]]:
+    """Non-streaming chat completion, used for background jobs."""
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": "Bearer " + OPENAI_API_KEY,
+    }
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if histories:
+        messages.extend(histories)
+    messages.append({"role": "user", "content": message})
+
+    data = {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.2,
+    }
+
+    for attempt in range(retried + 1):
+        await rate_limit.acquire(
+            model,
+            estimate_tokens(*(m["content"] for m in messages)),
         )
-    except Exception as e:
-        logger.exception(f"OpenAI embedding failed: {e}")
-        if retried > 0:
-            logger.exception(f"OpenAI embedding failed, retrying {retried}...")
-            return embed(texts, retried - 1)
-        logger.exception("OpenAI embedding failed, give up.")
+        response = None
+        try:
+            response = await get_http_client(OPENAI_BASE_URL).post(
+                f"{OPENAI_BASE_URL}/v1/chat/completions",
+                headers=headers,
+                content=json.dumps(data),
+                timeout=OPENAI_TIMEOUT_SECONDS,
+            )
+            if response.status_code == 200:
+                result = response.json()
+                content = result["choices"][0]["message"]["content"]
+                record_token_usage(model, result["usage"])
+                return True, content, result["usage"]
+            logger.error(f"Got status code {response.status_code}: {response.text}")
+            if not is_retryable(response.status_code):
+                break
+        except httpx.HTTPError:
+            logger.exception("OpenAI chat completion failed")
+        if attempt < retried:
+            delay = retry_delay(attempt, response)
+            logger.warning(f"OpenAI chat completion failed, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    logger.error("OpenAI chat completion failed, give up.")
     return False, None, None
 
 
-def chat_completion_stream(
+def get_provider(provider: str) -> Tuple[str, str]:
+    """Return the API base URL and key of an OpenAI-compatible provider."""
+    if provider == "gemini":
+        return settings.GEMINI_BASE_URL.rstrip("/"), settings.GEMINI_API_KEY
+    return f"{OPENAI_BASE_URL}/v1", OPENAI_API_KEY
+
+
+async def chat_completion_stream(
     message: str,
     language: str = "en",
     model: str = "gpt-4o-mini",
     system_prompt: str = DEFAULT_PROMPT,
-    histories: Optional[list] = None,
+    histories: Optional[List[ChatMessage]] = None,
     retried: int = 1,
-) -> Generator:
+    provider: str = "openai",
+) -> ChunkStream:
+    api_base, api_key = get_provider(provider)
     headers = {
         "Content-Type": "application/json",
-        "Authorization": "Bearer " + OPENAI_API_KEY,
+        "Authorization": "Bearer " + api_key,
     }
 
     system_message = {"role": "system", "content": system_prompt}
@@ -188,41 +294,80 @@ def chat_completion_stream(
         "model": model,
         "messages": messages,
         "stream": True,
+        # The last chunk carries the token usage of the whole answer
+        "stream_options": {"include_usage": True},
         "temperature": 0.2,
     }
 
-    try:
-        response = requests.post(
-            f"{OPENAI_BASE_URL}/v1/chat/completions",
-            headers=headers,
-            data=json.dumps(data),
-            stream=True,
-            timeout=OPENAI_TIMEOUT_SECONDS,
+    is_streaming = False
+    for attempt in range(retried + 1):
+        await rate_limit.acquire(
+            model,
+            estimate_tokens(*(m["content"] for m in messages)),
         )
-        if response.status_code == 200:
-            for line in response.iter_lines():
-                chunk_content, usage = extract_streaming_chunk(line)
-                if chunk_content is not None:
-                    yield True, chunk_content, usage
-        else:
-            raise Exception(f"Got status code {response.status_code}: {response.text}")
-    except Exception:
-        if retried > 0:
-            logger.exception("OpenAI chat completion failed, retrying...")
-            yield from chat_completion_stream(
-                message=message,
-                language=language,
-                model=model,
-                system_prompt=system_prompt,
-                histories=histories,
-                retried=retried - 1,
-            )
-        else:
-            logger.exception("OpenAI chat completion stream failed, give up.")
-            yield False, None, None
+        response = None
+        try:
+            async with get_http_client(api_base).stream(
+                "POST",
+                f"{api_base}/chat/completions",
+                headers=headers,
+                content=json.dumps(data),
+                timeout=OPENAI_TIMEOUT_SECONDS,
+            ) as response:
+                if response.status_code == 200:
+                    async for chunk_content, usage in iter_stream_chunks(
+                        response,
+                        model,
+                    ):
+                        is_streaming = True
+                        yield True, chunk_content, usage
+                    return
+                await response.aread()
+                logger.error(
+                    f"Got status code {response.status_code}: {response.text}",
+                )
+            if not is_retryable(response.status_code):
+                break
+        except httpx.HTTPError:
+            logger.exception("OpenAI chat completion stream failed")
+            # Only retry before anything was streamed, the client already got
+            # the first part of the answer otherwise
+            if is_streaming:
+                break
+        if attempt < retried:
+            delay = retry_delay(attempt, response)
+            logger.warning(f"OpenAI chat completion failed, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    logger.error("OpenAI chat completion stream failed, give up.")
+    yield False, None, None
 
 
-def extract_streaming_chunk(line: bytes) -> tuple:
+async def iter_stream_chunks(
+    response: httpx.Response,
+    model: str,
+) -> AsyncGenerator[Tuple[str, Optional[Usage]], None]:
+    """Yield the (content, usage) chunks of a stream, recording the usage."""
+    async for line in iter_sse_lines(response):
+        chunk_content, usage = extract_streaming_chunk(line)
+        if usage is not None:
+            record_token_usage(model, usage)
+        if chunk_content is not None:
+            yield chunk_content, usage
+
+
+async def iter_sse_lines(response: httpx.Response) -> AsyncGenerator[bytes, None]:
+    """Yield the raw lines of an SSE response without decoding them."""
+    buffer = b""
+    async for data in response.aiter_bytes():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer:
+        yield buffer.rstrip(b"\r")
+
+
+def extract_streaming_chunk(line: bytes) -> Tuple[Optional[str], Optional[Usage]]:
     # https://github.com/openai/openai-python/blob/5453a19efe6fa4395673782e5e3bd161572d383c/openai/api_requestor.py#L106
     if line and line.startswith(b"data: "):
         # SSE event may be valid when it contain whitespace
@@ -232,18 +377,18 @@ def extract_streaming_chunk(line: bytes) -> tuple:
             # return here will cause GeneratorExit exception in urllib3
             # and it will close http connection with TCP Reset
             return END_OF_STREAM, None
+        if line == b"[DONE]":
+            return None, None
         try:
             # Sometime, OpenAI send an invalid chunk. This seem a bug from OpenAI
             # OpenAI streaming chunk: b'"{\\"rate_limit_usage\\": {\\'
             # https://community.openai.com/t/receiving-rate-limit-usage-in-completion-stream/427476/
-            chunk_decode = json.loads(line.decode("utf-8"))
-            if chunk_decode["choices"]:
-                return (
-                    chunk_decode["choices"][0]["delta"].get("content"),
-                    None,
-                )
+            chunk_decode = orjson.loads(line)
+            choices = chunk_decode["choices"]
+            if choices:
+                return choices[0]["delta"].get("content"), None
             return USAGE_CHAR, chunk_decode["usage"]
         except Exception:
-            logger.warning(f"OpenAI streaming chunk: {line}")
+            logger.warning(f"OpenAI streaming chunk: {line!r}")
             return None, None
     return None, None
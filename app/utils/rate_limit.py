@@ -0,0 +1,157 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.settings import settings
+
+# Status codes worth retrying, anything else fails immediately
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+CREATE_BUCKETS_SQL = """
+CREATE UNLOGGED TABLE IF NOT EXISTS {schema}.rate_limit_buckets (
+    bucket TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL
+)
+"""
+
+# Refill the bucket for the elapsed time and reserve the cost in one statement.
+# The balance may go negative: the caller then waits until it is paid back,
+# so concurrent callers queue up instead of all retrying at once.
+RESERVE_SQL = """
+INSERT INTO {schema}.rate_limit_buckets AS b (bucket, tokens, updated_at)
+VALUES (:bucket, :capacity - :cost, clock_timestamp())
+ON CONFLICT (bucket) DO UPDATE SET
+    tokens = LEAST(
+        :capacity,
+        b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * :rate
+    ) - :cost,
+    updated_at = clock_timestamp()
+RETURNING tokens
+"""
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets per model.
+
+    Buckets live in Postgres so every gunicorn worker draws from the same
+    budget. Limits are read from settings.RATE_LIMITS, models without an
+    entry are not limited.
+    """
+
+    def __init__(self, engine: AsyncEngine, limits: Dict[str, Dict[str, int]]) -> None:
+        self.engine = engine
+        self.limits = limits
+
+    async def setup(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(CREATE_BUCKETS_SQL.format(schema=settings.DB_VECTOR_SCHEMA)),
+            )
+
+    async def acquire(self, model: str, tokens: int) -> None:
+        """Wait until the model's budgets allow one request of this many tokens."""
+        limit = self.limits.get(model)
+        if not limit:
+            return
+        try:
+            waits = [0.0]
+            if limit.get("rpm"):
+                waits.append(await self._reserve(f"{model}:rpm", limit["rpm"], 1))
+            if limit.get("tpm"):
+                waits.append(
+                    await self._reserve(f"{model}:tpm", limit["tpm"], tokens),
+                )
+        except Exception as e:
+            # Never fail a request because the limiter is unavailable
+            logger.warning(f"Rate limiter unavailable: {e}")
+            return
+        wait = max(waits)
+        if wait > 0:
+            logger.debug(f"Rate limit for {model}, waiting {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    async def _reserve(self, bucket: str, per_minute: int, cost: int) -> float:
+        rate = per_minute / 60
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                text(RESERVE_SQL.format(schema=settings.DB_VECTOR_SCHEMA)),
+                {
+                    "bucket": bucket,
+                    "capacity": per_minute,
+                    "cost": min(cost, per_minute),
+                    "rate": rate,
+                },
+            )
+            balance = result.scalar_one()
+        return max(0.0, -balance / rate)
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+async def init_rate_limiter(engine: AsyncEngine) -> RateLimiter:
+    """Create the shared rate limiter, called on startup."""
+    global _limiter  # noqa: PLW0603
+    _limiter = RateLimiter(engine, settings.RATE_LIMITS)
+    if _limiter.limits:
+        await _limiter.setup()
+    return _limiter
+
+
+async def acquire(model: str, tokens: int) -> None:
+    """Wait for the model's budget, a no-op outside of the application."""
+    if _limiter is not None:
+        await _limiter.acquire(model, tokens)
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Cheap token estimate used for budgeting, about 4 characters per token."""
+    return sum(len(t) for t in texts) // 4 + 1
+
+
+def is_retryable(status_code: int) -> bool:
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """
+    Delay before the next attempt.
+
+    Honors Retry-After (seconds or HTTP date) and retry-after-ms when the
+    provider sends them, otherwise exponential backoff with full jitter.
+    """
+    if response is not None:
+        retry_after = _parse_retry_after(response.headers)
+        if retry_after is not None:
+            return min(retry_after, settings.RETRY_MAX_DELAY)
+    backoff = min(settings.RETRY_MAX_DELAY, settings.RETRY_BASE_DELAY * 2**attempt)
+    return random.uniform(0, backoff)  # noqa: S311
+
+
+def _parse_retry_after(headers: httpx.Headers) -> Optional[float]:
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
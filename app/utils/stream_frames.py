@@ -0,0 +1,112 @@
+import asyncio
+import time
+from contextlib import suppress
+from typing import List, Optional
+
+from app.utils.openai_connect import (
+    END_OF_STREAM,
+    USAGE_CHAR,
+    ChunkStream,
+    StreamChunk,
+)
+
+
+class _Frame:
+    """Token text buffered since the previous flush."""
+
+    def __init__(self, max_chars: int, max_delay: float) -> None:
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self.parts: List[str] = []
+        self.chars = 0
+        self.last_flush = -max_delay
+
+    def add(self, chunk: str) -> None:
+        self.parts.append(chunk)
+        self.chars += len(chunk)
+
+    def is_due(self) -> bool:
+        return (
+            self.chars >= self.max_chars
+            or time.perf_counter() - self.last_flush >= self.max_delay
+        )
+
+    def timeout(self) -> float:
+        """Seconds left until the buffered text has to be flushed."""
+        return max(0.0, self.last_flush + self.max_delay - time.perf_counter())
+
+    def flush(self) -> StreamChunk:
+        text = "".join(self.parts)
+        self.parts, self.chars = [], 0
+        self.last_flush = time.perf_counter()
+        return True, text, None
+
+
+async def _next(chunks: ChunkStream) -> StreamChunk:
+    return await chunks.__anext__()
+
+
+async def _close(
+    pending: Optional[asyncio.Task[StreamChunk]],
+    chunks: ChunkStream,
+) -> None:
+    """Cancel the pending read, then close the source stream."""
+    if pending is not None:
+        pending.cancel()
+        with suppress(asyncio.CancelledError, StopAsyncIteration, Exception):
+            await pending
+    await chunks.aclose()
+
+
+async def coalesce_chunks(
+    chunks: ChunkStream,
+    max_chars: int,
+    max_delay: float,
+) -> ChunkStream:
+    """
+    Merge streamed (is_success, chunk, usage) tokens into larger frames.
+
+    Text is flushed once max_chars are buffered or max_delay seconds passed
+    since the previous flush, even while waiting for the next token. The
+    first token is flushed immediately. Stream markers, usage chunks and
+    failures flush the buffer and are passed through unchanged. The source
+    stream is closed when the frames are, so its connection is released.
+    """
+    frame = _Frame(max_chars, max_delay)
+    pending: Optional[asyncio.Task[StreamChunk]] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.create_task(_next(chunks))
+            if frame.parts:
+                done, _ = await asyncio.wait({pending}, timeout=frame.timeout())
+                if not done:
+                    yield frame.flush()
+                    continue
+            try:
+                is_success, chunk, usage = await pending
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            is_token = (
+                is_success
+                and usage is None
+                and chunk != END_OF_STREAM
+                and chunk != USAGE_CHAR
+            )
+            if is_token and chunk is not None:
+                frame.add(chunk)
+                if frame.is_due():
+                    yield frame.flush()
+                continue
+
+            if frame.parts:
+                yield frame.flush()
+            yield is_success, chunk, usage
+
+        if frame.parts:
+            yield frame.flush()
+    finally:
+        await _close(pending, chunks)
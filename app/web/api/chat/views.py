@@ -1,9 +1,12 @@
-from fastapi import Depends, HTTPException
+from typing import Optional
+
+from fastapi import BackgroundTasks, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRouter
 from loguru import logger
 
 from app.services.chat import ChatService
+from app.services.dependencies import get_chat_service
 
 router = APIRouter()
 
@@ -13,10 +16,12 @@ async def answer(
     query: str,
     session_id: str,
     model: str,
-    chat_service: ChatService = Depends(),
+    background_tasks: BackgroundTasks,
+    chat_service: ChatService = Depends(get_chat_service),
 ) -> StreamingResponse:
     try:
         answers = chat_service.answer(query, session_id, model)
+        background_tasks.add_task(chat_service.compact_session, session_id)
         return StreamingResponse(answers, media_type="text/plain")
     except Exception as e:
         logger.exception(e)
@@ -32,10 +37,12 @@ async def answer_dify(
     query: str,
     session_id: str,
     model: str,
-    chat_service: ChatService = Depends(),
+    background_tasks: BackgroundTasks,
+    chat_service: ChatService = Depends(get_chat_service),
 ) -> StreamingResponse:
     try:
         answers = chat_service.answer(query, session_id, model, dify_response=True)
+        background_tasks.add_task(chat_service.compact_session, session_id)
         return StreamingResponse(answers, media_type="text/plain")
     except Exception as e:
         logger.exception(e)
@@ -43,5 +50,21 @@ async def answer_dify(
 
 
 @router.get("/check_history", response_model=None)
-async def check_history(session_id: str, chat_service: ChatService = Depends()) -> list:
+async def check_history(
+    session_id: str,
+    chat_service: ChatService = Depends(get_chat_service),
+) -> list:
     return await chat_service.get_chat_history(session_id)
+
+
+@router.delete("/sessions")
+async def clear_sessions(
+    session_id: Optional[str] = None,
+    chat_service: ChatService = Depends(get_chat_service),
+) -> None:
+    """Delete the history of one session, or of all sessions."""
+    try:
+        await chat_service.clear_sessions(session_id)
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e)) from None
@@ -6,6 +6,7 @@ from loguru import logger
 from pydantic import BaseModel, HttpUrl
 
 from app.services.crawl import CrawlService
+from app.services.dependencies import get_crawl_service
 
 router = APIRouter()
 
@@ -23,7 +24,7 @@ class CrawlResponse(BaseModel):
 @router.post("/crawl", response_model=CrawlResponse)
 async def crawl_url(
     request: CrawlRequest,
-    crawl_service: CrawlService = Depends(),
+    crawl_service: CrawlService = Depends(get_crawl_service),
 ) -> CrawlResponse:
     try:
         result = await crawl_service.crawl_url(str(request.url))
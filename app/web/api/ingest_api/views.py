@@ -2,13 +2,14 @@ import mimetypes
 import os
 from typing import Annotated, Optional
 
-from fastapi import Depends, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.routing import APIRouter
 from loguru import logger
 
 from app.schemas.ingest_schema import FileMetadata
 from app.schemas.retrieval_schema import RetrievalResponse
+from app.services.dependencies import get_ingest_service, get_retrieval_service
 from app.services.ingest import IngestService
 from app.services.retrieval import RetrievalService
 
@@ -22,7 +23,7 @@ async def ingest_data(
         list[UploadFile],
         File(description="Multiple files as UploadFile"),
     ],
-    ingest_service: IngestService = Depends(),
+    ingest_service: IngestService = Depends(get_ingest_service),
 ) -> JSONResponse:
     """Handle file ingestion with MIME type validation and metadata construction."""
     allowed_types = [
@@ -36,6 +37,10 @@ async def ingest_data(
     file_metadata_list = []
 
     for file in files:
+        if not file.filename:
+            # Chunks are keyed and synced by the file name of their document
+            raise HTTPException(status_code=400, detail="Uploaded files need a name")
+
         custom_content_type = file.content_type
 
         if file.content_type == "application/octet-stream" or not file.content_type:
@@ -93,7 +98,7 @@ async def search_data(
     score_threshold: float = 0.5,
     rerank: bool = True,
     source: Optional[str] = None,
-    retrieval_service: RetrievalService = Depends(),
+    retrieval_service: RetrievalService = Depends(get_retrieval_service),
 ) -> RetrievalResponse:
     try:
         records = await retrieval_service.hybrid_search(
@@ -112,38 +117,61 @@ async def search_data(
         raise HTTPException(status_code=500, detail=str(e)) from None
 
 
-@router.get("/get_all")
-async def get_all_data(
-    retrieval_service: RetrievalService = Depends(),
-) -> JSONResponse:
+@router.get("/export")
+async def export_data(
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, gt=0),
+    include_embeddings: bool = False,
+    retrieval_service: RetrievalService = Depends(get_retrieval_service),
+) -> StreamingResponse:
+    """
+    Stream the chunks of the collection as NDJSON, one chunk per line.
+
+    Chunks are ordered by id. To read the next page, pass the id of the last
+    line received as after. Embeddings are left out unless requested.
+    """
     try:
-        records = await retrieval_service.get_all_chunks(
+        lines = await retrieval_service.export_chunks(
             collection_name=COLLECTION_NAME,
+            after_id=after,
+            limit=limit,
+            include_embeddings=include_embeddings,
         )
-        records = [
-            {
-                "id": record.id,
-                "embedding": record.embedding,
-                "payload": record.payload,
-            }
-            for record in records
-        ]
-        return JSONResponse(content={"records": records})
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail=str(e)) from None
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 
 @router.delete("/remove_all")
 async def remove_all_data(
-    retrieval_service: RetrievalService = Depends(),
+    retrieval_service: RetrievalService = Depends(get_retrieval_service),
 ) -> JSONResponse:
     """Delete all chunks from the collection."""
     try:
-        deleted_count = await retrieval_service.delete_all_chunks(
+        await retrieval_service.delete_all_chunks(collection_name=COLLECTION_NAME)
+        return JSONResponse(content={"message": "Successfully deleted all chunks"})
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(status_code=500, detail=str(e)) from None
+
+
+@router.delete("/remove_source")
+async def remove_source_data(
+    source: str,
+    retrieval_service: RetrievalService = Depends(get_retrieval_service),
+) -> JSONResponse:
+    """Delete the chunks of one ingested document, given its file name."""
+    try:
+        deleted_count = await retrieval_service.delete_source_chunks(
             collection_name=COLLECTION_NAME,
+            source=source,
+        )
+        return JSONResponse(
+            content={
+                "message": f"Successfully deleted {deleted_count} chunks of {source}",
+            },
         )
-        return JSONResponse(content={"message": f"Successfully deleted {deleted_count} chunks"})
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail=str(e)) from None
@@ -1,4 +1,18 @@
-from fastapi import APIRouter
+import os
+from typing import Any, Dict, cast
+
+from fastapi import APIRouter, Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+
+from app.core.settings import settings
 
 router = APIRouter()
 
@@ -10,3 +24,47 @@ def health_check() -> None:
 
     It returns 200 if the project is healthy.
     """
+
+
+@router.get("/metrics")
+def metrics() -> Response:
+    """
+    Prometheus metrics of the application.
+
+    Under gunicorn the metrics of all workers are aggregated, so any worker
+    can answer the scrape.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def _pool_stats(engine: AsyncEngine) -> Dict[str, Any]:
+    # The engines of app.db.utils always pool their connections in a queue
+    pool = cast(QueuePool, engine.pool)
+    capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "utilization": pool.checkedout() / capacity if capacity else 0.0,
+    }
+
+
+@router.get("/db_pool")
+def db_pool(request: Request) -> Dict[str, Any]:
+    """
+    Connection pool utilization of the worker serving the request.
+
+    The pool of the read replica is reported under "replica" when one is
+    configured.
+    """
+    stats = _pool_stats(request.app.state.db_engine)
+    if request.app.state.db_read_engine is not request.app.state.db_engine:
+        stats["replica"] = _pool_stats(request.app.state.db_read_engine)
+    return stats
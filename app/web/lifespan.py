@@ -1,9 +1,39 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from typing import AsyncGenerator
 
 from fastapi import FastAPI
+from loguru import logger
 
-from app.db.utils import _create_db_if_not_exists, _setup_db
+from app.core.settings import settings
+from app.db.collection_migrations import create_migration_table, migrate_all
+from app.db.dependencies import get_client
+from app.db.documents import create_document_table
+from app.db.generations import create_generation_table
+from app.db.utils import (
+    _bootstrap_db,
+    _create_db_if_not_exists,
+    async_engine,
+    prewarm_pool,
+    read_engine,
+)
+from app.services.chat import ChatService
+from app.services.crawl import CrawlService
+from app.services.embeddings import get_embedding_provider
+from app.services.ingest import IngestService
+from app.services.retrieval import RetrievalService
+from app.utils.http_client import close_http_clients, init_http_clients
+from app.utils.rate_limit import init_rate_limiter
+
+
+async def _run_chat_history_maintenance(chat_service: ChatService) -> None:
+    """Periodically roll chat history partitions and apply retention."""
+    while True:
+        try:
+            await chat_service.apply_retention()
+        except Exception as e:
+            logger.exception(f"Chat history maintenance failed: {e}")
+        await asyncio.sleep(settings.CHAT_HISTORY_MAINTENANCE_INTERVAL)
 
 
 @asynccontextmanager
@@ -20,10 +50,52 @@ async def lifespan_setup(
     :return: function that actually performs actions.
     """
     await _create_db_if_not_exists()
-    async_engine = _setup_db()
+    await _bootstrap_db()
     app.state.db_engine = async_engine
+    app.state.db_read_engine = read_engine
+    await prewarm_pool(async_engine, settings.DB_POOL_PREWARM)
+    if read_engine is not async_engine:
+        await prewarm_pool(read_engine, settings.DB_POOL_PREWARM)
     app.middleware_stack = None
     app.middleware_stack = app.build_middleware_stack()
 
+    app.state.http_clients = init_http_clients()
+    # Load local embedding models before serving requests
+    app.state.embedding_provider = get_embedding_provider()
+    logger.info(
+        f"Embedding provider {app.state.embedding_provider.name} "
+        f"({app.state.embedding_provider.dimension} dimensions)",
+    )
+
+    client = await get_client()
+    # Requests look collections up in the registry loaded here
+    await client.sync()
+    await create_generation_table(client.engine)
+    await create_migration_table(client.engine)
+    await create_document_table(client.engine)
+    await init_rate_limiter(client.engine)
+    # Services hold no per-request state and are shared by all requests
+    app.state.retrieval_service = RetrievalService(client=client)
+    app.state.chat_service = ChatService(
+        client=client,
+        retrieve_service=app.state.retrieval_service,
+    )
+    app.state.ingest_service = IngestService(client=client)
+    app.state.crawl_service = CrawlService()
+    await app.state.chat_service.setup_history()
+    maintenance_task = asyncio.create_task(
+        _run_chat_history_maintenance(app.state.chat_service),
+    )
+    # Index builds of large tables take a while, requests are served meanwhile
+    migration_task = asyncio.create_task(migrate_all(client.engine))
+
     yield
+    for task in (maintenance_task, migration_task):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await close_http_clients()
+    await app.state.embedding_provider.close()
+    if app.state.db_read_engine is not app.state.db_engine:
+        await app.state.db_read_engine.dispose()
     await app.state.db_engine.dispose()
@@ -0,0 +1,143 @@
+"""
+Benchmark of the answer prompt context, before and after compression.
+
+Measures the tokens and latency of the context with and without packing and
+extractive compression.
+
+Chunks markdown documents like the ingest does, retrieves the top chunks of
+every query with BM25 and builds the context three ways: all chunks joined
+(the old prompt), packed, and compressed then packed. With --llm, every
+prompt is also streamed through the chat completion API to measure time to
+first token and total generation time; point OPENAI_BASE_URL at
+scripts/standins.py to do it without quota.
+
+    PYTHONPATH=. python scripts/benchmark_context.py --docs data/raw_data --llm
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from app.schemas.retrieval_schema import RetrievalRecord
+from app.services.context import compress_records, pack_context
+from app.services.context.compression import lexical_scores
+from app.services.ingest import CHUNK_SIZE, OVERLAP_SIZE
+from app.services.prompts import SYSTEM_PROMPT, USER_MESSAGE_TEMPLATE
+from app.text_splitter import split_text_into_chunks
+from app.utils.openai_connect import chat_completion_stream, num_tokens
+
+QUERIES = [
+    "How do I reset the smart lock to factory settings?",
+    "Which devices work with the hub?",
+    "How long does the camera battery last?",
+    "Can I share access to the door lock with my family?",
+    "What does the blinking red light on the sensor mean?",
+]
+
+
+def load_chunks(docs_dir: str, pattern: str) -> List[str]:
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(docs_dir, pattern))):
+        with open(path, encoding="utf-8") as file:
+            sections = [file.read()]
+        section_chunks, _ = split_text_into_chunks(
+            {"sections": sections, "tables": []},
+            CHUNK_SIZE,
+            OVERLAP_SIZE,
+        )
+        chunks.extend(c["chunk"] for c in section_chunks)
+    return chunks
+
+
+def retrieve(query: str, chunks: List[str], top_k: int) -> List[RetrievalRecord]:
+    scores = lexical_scores(query, chunks)
+    ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+    return [
+        RetrievalRecord(content=chunks[i], score=scores[i])
+        for i in ranked[:top_k]
+    ]
+
+
+async def time_generation(prompt: str, model: str) -> tuple:
+    start = time.perf_counter()
+    first_token = None
+    async for is_success, chunk, _ in chat_completion_stream(
+        message=prompt,
+        model=model,
+        system_prompt=SYSTEM_PROMPT,
+    ):
+        if not is_success:
+            raise RuntimeError("Chat completion failed")
+        if first_token is None and chunk:
+            first_token = time.perf_counter() - start
+    return first_token or 0.0, time.perf_counter() - start
+
+
+async def main(args: argparse.Namespace) -> None:
+    chunks = load_chunks(args.docs, args.pattern)
+    if not chunks:
+        print(f"No documents matching '{args.pattern}' in {args.docs}")
+        return
+    print(f"Loaded {len(chunks)} chunks")
+
+    results: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    for query in QUERIES:
+        records = retrieve(query, chunks, args.top_k)
+
+        variants = {"joined": "\n".join(r.content for r in records)}
+
+        start = time.perf_counter()
+        packed = pack_context(records, args.budget, args.model)
+        results["packed"]["cpu_ms"].append((time.perf_counter() - start) * 1000)
+        variants["packed"] = packed.text
+
+        start = time.perf_counter()
+        compressed = await compress_records(query, records, args.sentences)
+        packed = pack_context(compressed, args.budget, args.model)
+        results["compressed"]["cpu_ms"].append((time.perf_counter() - start) * 1000)
+        variants["compressed"] = packed.text
+
+        for name, context in variants.items():
+            prompt = USER_MESSAGE_TEMPLATE.format(
+                search_results=context,
+                question=query,
+            )
+            results[name]["context_tokens"].append(num_tokens(context, args.model))
+            results[name]["prompt_tokens"].append(num_tokens(prompt, args.model))
+            if args.llm:
+                first_token, total = await time_generation(prompt, args.model)
+                results[name]["ttft_s"].append(first_token)
+                results[name]["total_s"].append(total)
+
+    metrics = ["context_tokens", "prompt_tokens", "cpu_ms"]
+    if args.llm:
+        metrics += ["ttft_s", "total_s"]
+    print(f"\n===== Context Benchmark ({len(QUERIES)} queries, mean) =====")
+    print(f"{'variant':<12}" + "".join(f"{m:>16}" for m in metrics))
+    for name in ("joined", "packed", "compressed"):
+        row = f"{name:<12}"
+        for metric in metrics:
+            values = results[name].get(metric)
+            row += f"{statistics.mean(values):>16.3f}" if values else f"{'-':>16}"
+        print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark prompt context size")
+    parser.add_argument("--docs", default="data/raw_data/", help="Document directory")
+    parser.add_argument("--pattern", default="*.md")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=2000, help="Context tokens")
+    parser.add_argument("--sentences", type=int, default=3, help="Kept per chunk")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument(
+        "--llm",
+        action="store_true",
+        help="Measure generation latency of every prompt",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,198 @@
+"""
+Load-generation harness for the RAG endpoints.
+
+Drives /api/answer, /api/search and /api/ingest of a running app with a
+mix of requests and reports throughput, latency percentiles and, for
+answers, time to first token. Run the app against Postgres and the
+stand-ins from scripts/standins.py to measure it without upstream quota:
+
+    python scripts/standins.py --port 9000 &
+    python scripts/load_test.py --concurrency 32 --duration 60
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+QUERIES = [
+    "How do I reset the smart lock to factory settings?",
+    "Which devices work with the hub?",
+    "How long does the camera battery last?",
+    "Can I share access to the door lock with my family?",
+    "What does the blinking red light on the sensor mean?",
+    "How do I connect the doorbell to a new wifi network?",
+    "Does the thermostat support scheduling by room?",
+    "What is the warranty period for the robot vacuum?",
+]
+
+DOCUMENT_TEMPLATE = """# Load test document {index}
+
+This document describes device {index} and how it connects to the hub.
+
+The device is configured from the settings page of the mobile app. Battery
+life is about {months} months with default settings.
+
+To reset the device hold the button for {seconds} seconds until the light
+blinks.
+"""
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Results:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.first_tokens: List[float] = []
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def report(self, elapsed: float) -> None:
+        total = sum(len(v) for v in self.latencies.values())
+        print(f"\n===== Load Test Summary ({elapsed:.1f}s) =====")
+        print(f"Completed requests: {total}, throughput: {total / elapsed:.2f} req/s")
+        header = f"{'endpoint':<10}{'count':>8}{'errors':>8}{'req/s':>9}"
+        header += f"{'p50':>9}{'p95':>9}{'p99':>9}"
+        print(header)
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies[endpoint]
+            print(
+                f"{endpoint:<10}{len(values):>8}{self.errors[endpoint]:>8}"
+                f"{len(values) / elapsed:>9.2f}"
+                f"{percentile(values, 50):>9.3f}{percentile(values, 95):>9.3f}"
+                f"{percentile(values, 99):>9.3f}",
+            )
+        if self.first_tokens:
+            print(
+                "Time to first token: "
+                f"p50 {percentile(self.first_tokens, 50):.3f}s, "
+                f"p95 {percentile(self.first_tokens, 95):.3f}s, "
+                f"p99 {percentile(self.first_tokens, 99):.3f}s",
+            )
+
+
+async def run_answer(client: httpx.AsyncClient, args: argparse.Namespace) -> float:
+    """Stream an answer, returning the time to its first body bytes."""
+    params = {
+        "query": random.choice(QUERIES),  # noqa: S311
+        "session_id": f"load-{uuid.uuid4().hex[:8]}",
+        "model": args.model,
+    }
+    start = time.perf_counter()
+    first_token: Optional[float] = None
+    async with client.stream("GET", "/api/answer", params=params) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if first_token is None and chunk:
+                first_token = time.perf_counter() - start
+    return first_token if first_token is not None else time.perf_counter() - start
+
+
+async def run_search(client: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    params = {
+        "query": random.choice(QUERIES),  # noqa: S311
+        "top_k": 5,
+        "rerank": args.rerank,
+    }
+    response = await client.post("/api/search", params=params)
+    response.raise_for_status()
+
+
+async def run_ingest(client: httpx.AsyncClient, args: argparse.Namespace) -> None:
+    index = uuid.uuid4().hex[:8]
+    document = DOCUMENT_TEMPLATE.format(
+        index=index,
+        months=random.randint(3, 24),  # noqa: S311
+        seconds=random.randint(3, 15),  # noqa: S311
+    )
+    files = {"files": (f"load-{index}.md", document.encode(), "text/markdown")}
+    response = await client.post("/api/ingest", files=files)
+    response.raise_for_status()
+
+
+RUNNERS = {"answer": run_answer, "search": run_search, "ingest": run_ingest}
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    endpoints: List[str],
+    weights: List[float],
+    deadline: float,
+    results: Results,
+) -> None:
+    while time.perf_counter() < deadline:
+        endpoint = random.choices(endpoints, weights)[0]  # noqa: S311
+        start = time.perf_counter()
+        try:
+            first_token = await RUNNERS[endpoint](client, args)
+        except Exception as e:
+            results.errors[endpoint] += 1
+            if args.verbose:
+                print(f"{endpoint} failed: {e!r}")
+            continue
+        results.latencies[endpoint].append(time.perf_counter() - start)
+        if first_token is not None:
+            results.first_tokens.append(first_token)
+
+
+async def main(args: argparse.Namespace) -> None:
+    mix = {"answer": args.answer_weight, "search": args.search_weight}
+    mix["ingest"] = args.ingest_weight
+    endpoints = [e for e, w in mix.items() if w > 0]
+    weights = [mix[e] for e in endpoints]
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(
+        base_url=args.url,
+        limits=limits,
+        timeout=timeout,
+    ) as client:
+        for _ in range(args.seed_documents):
+            await run_ingest(client, args)
+        if args.seed_documents:
+            print(f"Ingested {args.seed_documents} seed documents")
+
+        results = Results()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            *(
+                worker(client, args, endpoints, weights, deadline, results)
+                for _ in range(args.concurrency)
+            ),
+        )
+        results.report(time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the RAG endpoints")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--timeout", type=float, default=60, help="Per request")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--rerank", action="store_true", help="Rerank searches")
+    parser.add_argument("--answer-weight", type=float, default=0.6)
+    parser.add_argument("--search-weight", type=float, default=0.35)
+    parser.add_argument("--ingest-weight", type=float, default=0.05)
+    parser.add_argument(
+        "--seed-documents",
+        type=int,
+        default=20,
+        help="Documents ingested before the measurement starts",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Print failures")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,229 @@
+"""
+Local stand-ins for the upstream APIs used by the RAG path.
+
+Serves the OpenAI embeddings and chat completion APIs, Cohere rerank and
+DeepDocs parse on one port so the app can be load-tested without spending
+real quota. Point the app at it with:
+
+    OPENAI_BASE_URL=http://localhost:9000
+    COHERE_BASE_URL=http://localhost:9000
+    DEEPDOCS_API_URL=http://localhost:9000/api/parser/upload
+
+Latencies and the token rate are configurable, see --help.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import AsyncGenerator, List
+
+import uvicorn
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+ANSWER_WORDS = (
+    "the product supports this feature when it is configured in the settings "
+    "page and the device is connected to the same network as the hub"
+).split()
+
+app = FastAPI(title="Upstream stand-ins")
+config = argparse.Namespace()
+
+
+async def delay(milliseconds: float) -> None:
+    """Sleep for the configured latency, with jitter."""
+    if milliseconds <= 0:
+        return
+    jitter = milliseconds * config.jitter
+    offset = random.uniform(-jitter, jitter)  # noqa: S311
+    await asyncio.sleep(max(0.0, milliseconds + offset) / 1000)
+
+
+def count_tokens(*texts: str) -> int:
+    return sum(len(TOKEN_PATTERN.findall(text)) for text in texts)
+
+
+def hash_embedding(text: str, dimension: int) -> List[float]:
+    """Deterministic embedding: texts sharing words get similar vectors."""
+    vector = [0.0] * dimension
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimension
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return [v / norm for v in vector]
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request) -> JSONResponse:
+    body = await request.json()
+    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    await delay(config.embedding_latency_ms + config.embedding_per_text_ms * len(texts))
+    tokens = count_tokens(*texts)
+    return JSONResponse(
+        {
+            "object": "list",
+            "model": body.get("model"),
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": hash_embedding(text, config.dimension),
+                }
+                for i, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        },
+    )
+
+
+def answer_tokens() -> List[str]:
+    return [
+        ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(config.answer_tokens)
+    ]
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request) -> JSONResponse:
+    body = await request.json()
+    prompt_tokens = count_tokens(*(m["content"] for m in body["messages"]))
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": config.answer_tokens,
+        "total_tokens": prompt_tokens + config.answer_tokens,
+    }
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        stream_ms = 1000 * config.answer_tokens / config.tokens_per_second
+        await delay(config.first_token_ms + stream_ms)
+        return JSONResponse(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": "".join(answer_tokens()),
+                        },
+                        "finish_reason": "stop",
+                    },
+                ],
+                "usage": usage,
+            },
+        )
+
+    def event(choices: list, **extra: dict) -> bytes:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": body["model"],
+            "choices": choices,
+            **extra,
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    async def stream() -> AsyncGenerator:
+        await delay(config.first_token_ms)
+        interval = 1 / config.tokens_per_second
+        next_at = time.perf_counter()
+        for token in answer_tokens():
+            yield event([{"index": 0, "delta": {"content": token}}])
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if body.get("stream_options", {}).get("include_usage"):
+            yield event([], usage=usage)
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/v1/rerank")
+async def rerank(request: Request) -> JSONResponse:
+    body = await request.json()
+    documents = body["documents"]
+    await delay(config.rerank_latency_ms)
+    query_words = set(TOKEN_PATTERN.findall(body["query"].lower()))
+    scores = []
+    for index, document in enumerate(documents):
+        words = set(TOKEN_PATTERN.findall(document.lower()))
+        overlap = len(query_words & words) / (len(query_words) or 1)
+        scores.append({"index": index, "relevance_score": round(overlap, 4)})
+    scores.sort(key=lambda r: r["relevance_score"], reverse=True)
+    return JSONResponse(
+        {
+            "id": str(uuid.uuid4()),
+            "results": scores[: body.get("top_n") or len(scores)],
+            "meta": {"billed_units": {"search_units": 1}},
+        },
+    )
+
+
+@app.post("/api/parser/upload")
+async def parse(
+    file: UploadFile = File(...),
+    parser_type: str = Form("general"),
+) -> JSONResponse:
+    # Files are read as text, every blank-line separated block is a section
+    content = (await file.read()).decode("utf-8", errors="ignore")
+    await delay(config.parse_latency_ms)
+    blocks = [b.strip() for b in re.split(r"\n\s*\n", content) if b.strip()]
+    return JSONResponse(
+        {
+            "sections": [[block, ""] for block in blocks],
+            "tables": [],
+        },
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--embedding-latency-ms", type=float, default=80)
+    parser.add_argument(
+        "--embedding-per-text-ms",
+        type=float,
+        default=1,
+        help="Extra embedding latency per text in a batch",
+    )
+    parser.add_argument(
+        "--first-token-ms",
+        type=float,
+        default=400,
+        help="Chat completion latency before the first token",
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--rerank-latency-ms", type=float, default=120)
+    parser.add_argument("--parse-latency-ms", type=float, default=500)
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.2,
+        help="Relative jitter applied to every latency, 0.2 is +-20%%",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    config = parse_args()
+    uvicorn.run(app, host=config.host, port=config.port, log_level="warning")
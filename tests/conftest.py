@@ -0,0 +1,67 @@
+import uuid
+from typing import AsyncGenerator
+
+import pytest
+from sqlalchemy import delete, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.settings import settings
+from app.db.base import Base
+from app.db.collection_migrations import create_migration_table
+from app.db.collection_migrations.runner import AppliedMigration
+from app.db.dependencies import PgVectorClient
+from app.db.documents import CollectionDocument, create_document_table
+from app.db.generations import CollectionGeneration, create_generation_table
+from app.db.registry import collection_registry
+from app.db.utils import _bootstrap_db, async_engine, session_factory
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    """
+    Backend for anyio pytest plugin.
+
+    :return: backend name.
+    """
+    return "asyncio"
+
+
+@pytest.fixture
+async def pg_client() -> AsyncGenerator[PgVectorClient, None]:
+    """
+    Client of the configured database, see the PGVECTOR_* settings.
+
+    Tests using it are skipped when the database cannot be reached.
+    """
+    try:
+        await _bootstrap_db()
+    except (OSError, SQLAlchemyError) as e:
+        pytest.skip(f"Database is not available: {e}")
+    await create_migration_table(async_engine)
+    await create_document_table(async_engine)
+    await create_generation_table(async_engine)
+    yield PgVectorClient(async_engine, session_factory)
+    # Connections belong to the event loop of the test
+    await async_engine.dispose()
+    collection_registry.loaded = False
+    collection_registry._lock = None  # noqa: SLF001
+
+
+@pytest.fixture
+async def collection_name(
+    pg_client: PgVectorClient,
+) -> AsyncGenerator[str, None]:
+    """Name of a collection of the test, dropped with its records afterwards."""
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    yield name
+    table = f"{settings.DB_VECTOR_SCHEMA}.{name}"
+    async with pg_client.engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+        for registry in (CollectionDocument, AppliedMigration, CollectionGeneration):
+            await conn.execute(
+                delete(registry).where(registry.collection_name == name),
+            )
+    collection_registry.collections.pop(name, None)
+    collection_registry.partitions.pop(name, None)
+    if table in Base.metadata.tables:
+        Base.metadata.remove(Base.metadata.tables[table])
@@ -0,0 +1,52 @@
+from typing import Any, List
+
+import pytest
+
+from app.db.dependencies import PgVectorClient
+from app.db.generations import bump_generation
+from app.db.models import PgVectorCollection
+from app.services import answer_cache
+from app.services.answer_cache import AnswerCache
+
+EMBEDDING = [1.0, 0.0, 0.0, 0.0]
+
+
+@pytest.fixture
+def evictions(
+    monkeypatch: pytest.MonkeyPatch,
+    collection_name: str,
+) -> List[Any]:
+    """Filters of the evictions, the cache is stored in the test collection."""
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_COLLECTION_NAME", collection_name)
+    filters: List[Any] = []
+    delete_by_filter = PgVectorCollection.delete_by_filter
+
+    async def recording(self: PgVectorCollection, filter_dict: Any) -> int:
+        filters.append(filter_dict)
+        return await delete_by_filter(self, filter_dict)
+
+    monkeypatch.setattr(PgVectorCollection, "delete_by_filter", recording)
+    return filters
+
+
+@pytest.mark.anyio
+async def test_entries_are_evicted_once_per_generation(
+    pg_client: PgVectorClient,
+    collection_name: str,
+    evictions: List[Any],
+) -> None:
+    cache = AnswerCache(pg_client)
+
+    await cache.store("q1", EMBEDDING, collection_name, "model", "a1")
+    await cache.store("q2", EMBEDDING, collection_name, "model", "a2")
+
+    assert len(evictions) == 1
+    assert await cache.lookup(EMBEDDING, collection_name, "model") is not None
+
+    await bump_generation(pg_client.session_maker, collection_name)
+    await cache.store("q3", EMBEDDING, collection_name, "model", "a3")
+
+    assert len(evictions) == 2
+    collection = await pg_client.get_collection(collection_name)
+    points = await collection.query_all(primary=True)
+    assert [point.payload["answer"] for point in points] == ["a3"]
@@ -0,0 +1,97 @@
+from typing import List
+
+import pytest
+
+from app.core.settings import settings
+from app.schemas.retrieval_schema import RetrievalRecord
+from app.services.context import compress_records, compression
+from app.services.embeddings import HashingEmbeddingProvider
+
+CONTENT = (
+    "The store opens at nine. "
+    "Refunds are issued within five days. "
+    "Parking is free on weekends. "
+    "Refunds need the original receipt."
+)
+
+
+class RecordingProvider(HashingEmbeddingProvider):
+    """Hashing embedder that records every batch."""
+
+    def __init__(self) -> None:
+        super().__init__(64)
+        self.batches: List[List[str]] = []
+
+    async def embed(self, texts: List[str]) -> tuple:
+        self.batches.append(texts)
+        return await super().embed(texts)
+
+
+@pytest.fixture
+def provider(monkeypatch: pytest.MonkeyPatch) -> RecordingProvider:
+    recording = RecordingProvider()
+    monkeypatch.setattr(compression, "get_embedding_provider", lambda: recording)
+    return recording
+
+
+@pytest.mark.anyio
+async def test_lexical_keeps_best_sentences_in_order() -> None:
+    records = [RetrievalRecord(content=CONTENT, score=0.9)]
+
+    compressed = await compress_records("refunds receipt", records, max_sentences=2)
+
+    assert compressed[0].content == (
+        "Refunds are issued within five days. Refunds need the original receipt."
+    )
+
+
+@pytest.mark.anyio
+async def test_short_chunks_are_kept_whole() -> None:
+    records = [RetrievalRecord(content="One sentence. Two sentences.", score=0.9)]
+
+    compressed = await compress_records("refunds", records, max_sentences=3)
+
+    assert compressed == records
+
+
+@pytest.mark.anyio
+async def test_embedding_scorer_embeds_query_with_sentences(
+    monkeypatch: pytest.MonkeyPatch,
+    provider: RecordingProvider,
+) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "hashing")
+    records = [RetrievalRecord(content=CONTENT, score=0.9)]
+
+    compressed = await compress_records(
+        "refunds receipt",
+        records,
+        max_sentences=2,
+        scorer="embedding",
+    )
+
+    assert len(provider.batches) == 1
+    assert provider.batches[0][0] == "refunds receipt"
+    assert len(provider.batches[0]) == 5
+    assert compressed[0].content.count(".") == 2
+
+
+@pytest.mark.anyio
+async def test_embedding_scorer_falls_back_to_bm25_for_remote_providers(
+    monkeypatch: pytest.MonkeyPatch,
+    provider: RecordingProvider,
+) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "openai")
+    records = [RetrievalRecord(content=CONTENT, score=0.9)]
+
+    compressed = await compress_records(
+        "refunds receipt",
+        records,
+        max_sentences=2,
+        scorer="embedding",
+        query_embedding=[1.0] * 64,
+    )
+
+    assert provider.batches == []
+    assert compressed[0].content == (
+        "Refunds are issued within five days. Refunds need the original receipt."
+    )
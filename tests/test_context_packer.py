@@ -0,0 +1,80 @@
+import pytest
+
+from app.schemas.retrieval_schema import RetrievalRecord
+from app.services.context import pack_context
+from app.utils.openai_connect import get_encoding, num_tokens
+
+SHARED = "The warranty covers parts and labour for two full years after purchase."
+
+
+@pytest.fixture(autouse=True)
+def encoding() -> None:
+    """Tokenizer files are downloaded by tiktoken on first use."""
+    try:
+        get_encoding("gpt-4o-mini")
+    except Exception as e:
+        pytest.skip(f"Tokenizer is not available: {e}")
+
+
+def record(content: str, score: float) -> RetrievalRecord:
+    return RetrievalRecord(content=content, score=score)
+
+
+def test_pack_context_orders_by_score() -> None:
+    context = pack_context(
+        [record("Second chunk.", 0.2), record("First chunk.", 0.9)],
+        token_budget=100,
+    )
+
+    assert context.text == "First chunk.\nSecond chunk."
+    assert context.chunks == 2
+
+
+def test_pack_context_strips_overlap_between_chunks() -> None:
+    first = f"Returns are accepted within thirty days. {SHARED}"
+    second = f"{SHARED} Batteries are covered for one year."
+
+    context = pack_context(
+        [record(first, 0.9), record(second, 0.8)],
+        token_budget=200,
+    )
+
+    assert context.text == f"{first}\nBatteries are covered for one year."
+    assert context.text.count(SHARED) == 1
+    assert context.saved_tokens > 0
+
+
+def test_pack_context_drops_repeated_sentences() -> None:
+    context = pack_context(
+        [
+            record(f"Intro. {SHARED} Shipping is free.", 0.9),
+            record(f"Other topic. {SHARED}", 0.8),
+        ],
+        token_budget=200,
+    )
+
+    assert context.text.count(SHARED) == 1
+    assert context.text.endswith("Other topic.")
+
+
+def test_pack_context_skips_chunks_over_budget() -> None:
+    large = " ".join(["Detailed specification sentence number one."] * 40)
+    small = "Short answer."
+
+    context = pack_context(
+        [record(large, 0.9), record(small, 0.5)],
+        token_budget=20,
+    )
+
+    assert context.text == small
+    assert context.chunks == 1
+    assert context.tokens == num_tokens(small)
+    assert context.tokens <= 20
+
+
+def test_pack_context_without_records() -> None:
+    context = pack_context([], token_budget=100)
+
+    assert context.text == ""
+    assert context.tokens == 0
+    assert context.chunks == 0
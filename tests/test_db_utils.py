@@ -0,0 +1,33 @@
+from typing import Any, List
+
+import pytest
+from asyncpg.connection import LoggedQuery
+from sqlalchemy import AdaptedConnection, event, text
+
+from app.core.settings import settings
+from app.db.dependencies import PgVectorClient
+from app.db.utils import _create_engine
+
+
+@pytest.mark.anyio
+async def test_new_pooled_connection_runs_no_ddl(pg_client: PgVectorClient) -> None:
+    engine = _create_engine(settings.db_url, "test")
+    queries: List[str] = []
+
+    # Runs before the codec is registered, so its queries are logged too
+    @event.listens_for(engine.sync_engine, "connect", insert=True)
+    def log_queries(dbapi_connection: AdaptedConnection, *args: Any) -> None:
+        def record(query: LoggedQuery) -> None:
+            queries.append(query.query)
+
+        dbapi_connection.driver_connection.add_query_logger(record)
+
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+
+    # The codec looks the vector type up, and nothing else runs
+    assert any("pg_type" in query for query in queries)
+    assert not [query for query in queries if "CREATE" in query.upper()]
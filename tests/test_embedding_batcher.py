@@ -0,0 +1,116 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app.utils import embedding_batcher
+from app.utils.embedding_batcher import EmbeddingCoalescer
+
+
+class RecordingProvider:
+    """Embeds a text as [len(text)] and records every batch."""
+
+    def __init__(self, is_success: bool = True) -> None:
+        self.is_success = is_success
+        self.dropped = 0
+        self.batches: List[List[str]] = []
+
+    async def embed(self, texts: List[str]) -> tuple:
+        self.batches.append(texts)
+        if not self.is_success:
+            return False, None, None
+        embeddings = [[float(len(text))] for text in texts]
+        return True, embeddings[self.dropped :], {"total_tokens": 1}
+
+
+@pytest.fixture
+def provider(monkeypatch: pytest.MonkeyPatch) -> RecordingProvider:
+    recording = RecordingProvider()
+    monkeypatch.setattr(embedding_batcher, "get_embedding_provider", lambda: recording)
+    return recording
+
+
+@pytest.mark.anyio
+async def test_concurrent_texts_share_one_batch(provider: RecordingProvider) -> None:
+    coalescer = EmbeddingCoalescer(max_batch_size=10, max_wait=0.01)
+
+    embeddings = await asyncio.gather(
+        coalescer.embed("a"),
+        coalescer.embed("bb"),
+        coalescer.embed("ccc"),
+    )
+
+    assert embeddings == [[1.0], [2.0], [3.0]]
+    assert provider.batches == [["a", "bb", "ccc"]]
+
+
+@pytest.mark.anyio
+async def test_identical_texts_are_embedded_once(provider: RecordingProvider) -> None:
+    coalescer = EmbeddingCoalescer(max_batch_size=10, max_wait=0.01)
+
+    embeddings = await asyncio.gather(
+        coalescer.embed("same"),
+        coalescer.embed("other"),
+        coalescer.embed("same"),
+    )
+
+    assert embeddings == [[4.0], [5.0], [4.0]]
+    assert provider.batches == [["same", "other"]]
+
+
+@pytest.mark.anyio
+async def test_full_batch_is_flushed_without_waiting(
+    provider: RecordingProvider,
+) -> None:
+    coalescer = EmbeddingCoalescer(max_batch_size=2, max_wait=60)
+
+    embeddings = await asyncio.wait_for(
+        asyncio.gather(coalescer.embed("a"), coalescer.embed("bb")),
+        timeout=1,
+    )
+
+    assert embeddings == [[1.0], [2.0]]
+    assert provider.batches == [["a", "bb"]]
+
+
+@pytest.mark.anyio
+async def test_batches_are_split_at_max_size(provider: RecordingProvider) -> None:
+    coalescer = EmbeddingCoalescer(max_batch_size=2, max_wait=0.01)
+
+    embeddings = await asyncio.gather(
+        *(coalescer.embed(text) for text in ("a", "bb", "ccc")),
+    )
+
+    assert embeddings == [[1.0], [2.0], [3.0]]
+    assert provider.batches == [["a", "bb"], ["ccc"]]
+
+
+@pytest.mark.anyio
+async def test_failed_batch_fails_every_caller(provider: RecordingProvider) -> None:
+    provider.is_success = False
+    coalescer = EmbeddingCoalescer(max_batch_size=10, max_wait=0.01)
+
+    results = await asyncio.gather(
+        coalescer.embed("a"),
+        coalescer.embed("bb"),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.anyio
+async def test_short_batch_fails_every_caller(provider: RecordingProvider) -> None:
+    provider.dropped = 1
+    coalescer = EmbeddingCoalescer(max_batch_size=10, max_wait=0.01)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            coalescer.embed("a"),
+            coalescer.embed("bb"),
+            return_exceptions=True,
+        ),
+        timeout=1,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,158 @@
+from io import BytesIO
+from typing import List
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.db.dependencies import PgVectorClient
+from app.db.documents import get_document_chunks
+from app.db.utils import async_engine, session_factory
+from app.services import ingest
+from app.services.embeddings import HashingEmbeddingProvider
+from app.services.ingest import IngestService, chunk_id
+from app.web.api.ingest_api.views import ingest_data
+
+DIMENSION = 16
+
+
+class RecordingProvider(HashingEmbeddingProvider):
+    """Hashing embedder that records the texts it embedded."""
+
+    def __init__(self) -> None:
+        super().__init__(DIMENSION)
+        self.texts: List[str] = []
+
+    async def embed(self, texts: List[str]) -> tuple:
+        self.texts.extend(texts)
+        return await super().embed(texts)
+
+
+@pytest.fixture
+def provider(monkeypatch: pytest.MonkeyPatch) -> RecordingProvider:
+    recording = RecordingProvider()
+    monkeypatch.setattr(ingest, "get_embedding_provider", lambda: recording)
+    return recording
+
+
+def prepare(service: IngestService, file_name: str, *texts: str) -> List[tuple]:
+    return service.prepare_chunks(
+        [{"chunk": text} for text in texts],
+        "section",
+        file_name,
+        "Manual",
+    )
+
+
+async def stored_ids(service: IngestService, name: str, file_name: str) -> set:
+    collection = await service.get_collection(name, DIMENSION)
+    return set(
+        await collection.find_ids({"source": {"$eq": file_name}}, primary=True),
+    )
+
+
+def test_chunk_ids_are_scoped_to_the_document() -> None:
+    assert chunk_id("a.md", "text") == chunk_id("a.md", "text")
+    assert chunk_id("a.md", "text") != chunk_id("b.md", "text")
+    assert chunk_id("a.md", "text") != chunk_id("a.md", "other")
+
+
+@pytest.mark.anyio
+async def test_upload_without_a_name_is_rejected() -> None:
+    file = UploadFile(BytesIO(b"# Manual"), headers={"content-type": "text/markdown"})
+    service = IngestService(PgVectorClient(async_engine, session_factory))
+
+    with pytest.raises(HTTPException) as error:
+        await ingest_data(files=[file], ingest_service=service)
+
+    assert error.value.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_sync_document_only_writes_the_diff(
+    pg_client: PgVectorClient,
+    collection_name: str,
+    provider: RecordingProvider,
+) -> None:
+    service = IngestService(pg_client)
+    first = prepare(service, "manual.md", "alpha", "beta", "gamma")
+    await service.sync_document(collection_name, DIMENSION, "manual.md", first)
+
+    assert len(provider.texts) == 3
+    assert await stored_ids(service, collection_name, "manual.md") == {
+        chunk[0] for chunk in first
+    }
+
+    provider.texts.clear()
+    second = prepare(service, "manual.md", "beta", "gamma", "delta")
+    await service.sync_document(collection_name, DIMENSION, "manual.md", second)
+
+    # Only the added chunk is embedded, the removed one is deleted
+    assert provider.texts == ["Manual\ndelta"]
+    expected = {chunk[0] for chunk in second}
+    assert await stored_ids(service, collection_name, "manual.md") == expected
+    assert (
+        await get_document_chunks(
+            pg_client.session_maker,
+            collection_name,
+            "manual.md",
+        )
+        == expected
+    )
+
+    provider.texts.clear()
+    await service.sync_document(collection_name, DIMENSION, "manual.md", second)
+
+    assert provider.texts == []
+    assert await stored_ids(service, collection_name, "manual.md") == expected
+
+
+@pytest.mark.anyio
+async def test_sync_document_leaves_other_documents_alone(
+    pg_client: PgVectorClient,
+    collection_name: str,
+    provider: RecordingProvider,
+) -> None:
+    service = IngestService(pg_client)
+    manual = prepare(service, "manual.md", "shared", "manual only")
+    guide = prepare(service, "guide.md", "shared", "guide only")
+    await service.sync_document(collection_name, DIMENSION, "manual.md", manual)
+    await service.sync_document(collection_name, DIMENSION, "guide.md", guide)
+
+    # Removing the shared text from one document keeps it in the other
+    await service.sync_document(
+        collection_name,
+        DIMENSION,
+        "manual.md",
+        prepare(service, "manual.md", "manual only"),
+    )
+
+    assert len(await stored_ids(service, collection_name, "manual.md")) == 1
+    assert await stored_ids(service, collection_name, "guide.md") == {
+        chunk[0] for chunk in guide
+    }
+
+
+@pytest.mark.anyio
+async def test_sync_document_diffs_unregistered_chunks(
+    pg_client: PgVectorClient,
+    collection_name: str,
+    provider: RecordingProvider,
+) -> None:
+    service = IngestService(pg_client)
+    old = prepare(service, "manual.md", "alpha", "beta")
+    # Written before the document registry existed
+    collection = await service.get_collection(collection_name, DIMENSION)
+    await collection.upsert_many(
+        ids=[chunk[0] for chunk in old],
+        embeddings=await service.embed_chunks(old),
+        payloads=[chunk[2] for chunk in old],
+    )
+
+    provider.texts.clear()
+    new = prepare(service, "manual.md", "beta", "gamma")
+    await service.sync_document(collection_name, DIMENSION, "manual.md", new)
+
+    assert provider.texts == ["Manual\ngamma"]
+    assert await stored_ids(service, collection_name, "manual.md") == {
+        chunk[0] for chunk in new
+    }
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from app.core.settings import settings
+from app.utils import llm_hedging
+from app.utils.llm_hedging import hedged_chat_completion_stream
+from app.utils.openai_connect import ChunkStream
+
+# Seconds before the first chunk of each model
+FIRST_CHUNK_DELAY = {"slow": 0.5, "fast": 0.0}
+
+
+class Streams:
+    """Stand-in for chat_completion_stream that records its requests."""
+
+    def __init__(self) -> None:
+        self.requests: List[Dict[str, Any]] = []
+        self.closed: List[str] = []
+
+    async def stream(self, **kwargs: Any) -> ChunkStream:
+        self.requests.append(kwargs)
+        model = kwargs["model"]
+        try:
+            await asyncio.sleep(FIRST_CHUNK_DELAY[model])
+            yield True, f"{model}:1", None
+            yield True, f"{model}:2", None
+        finally:
+            self.closed.append(model)
+
+
+@pytest.fixture
+def streams(monkeypatch: pytest.MonkeyPatch) -> Streams:
+    recording = Streams()
+    monkeypatch.setattr(llm_hedging, "chat_completion_stream", recording.stream)
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_MS", 50)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MODEL", "fast")
+    return recording
+
+
+async def collect(stream: ChunkStream) -> List[Any]:
+    return [chunk async for _, chunk, _ in stream]
+
+
+@pytest.mark.anyio
+async def test_hedge_wins_over_a_slow_primary(streams: Streams) -> None:
+    chunks = await collect(
+        hedged_chat_completion_stream("hi", model="slow", histories=[]),
+    )
+
+    assert chunks == ["fast:1", "fast:2"]
+    assert [request["model"] for request in streams.requests] == ["slow", "fast"]
+    assert streams.requests[1]["provider"] == settings.LLM_HEDGE_PROVIDER
+    assert streams.requests[1]["message"] == "hi"
+    assert "slow" in streams.closed
+
+
+@pytest.mark.anyio
+async def test_fast_primary_is_not_hedged(streams: Streams) -> None:
+    chunks = await collect(hedged_chat_completion_stream("hi", model="fast"))
+
+    assert chunks == ["fast:1", "fast:2"]
+    assert len(streams.requests) == 1
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.settings import settings
+from app.db.dependencies import PgVectorClient
+from app.db.partitions import (
+    LIST_PARTITIONS_DETACH_SQL,
+    LIST_PARTITIONS_SQL,
+    PARTITION_DATE_FORMAT,
+    PartitionSpec,
+    drop_expired_partitions,
+    ensure_time_partitions,
+)
+
+DIMENSION = 4
+
+BY_DAY = PartitionSpec(strategy="range", column="created_at")
+
+
+def days_old(name: str) -> int:
+    day = datetime.strptime(name.rsplit("_p", 1)[1], PARTITION_DATE_FORMAT).date()
+    return (datetime.utcnow().date() - day).days
+
+
+async def partitions(client: PgVectorClient, name: str) -> List[str]:
+    async with client.engine.connect() as conn:
+        result = await conn.execute(
+            text(LIST_PARTITIONS_SQL),
+            {"schema": settings.DB_VECTOR_SCHEMA, "table_name": name},
+        )
+        return sorted(row[0] for row in result.fetchall())
+
+
+async def daily_table(client: PgVectorClient, name: str) -> str:
+    """Daily partitioned table with partitions from ten days ago to today."""
+    collection = await client.create_collection(name, DIMENSION, BY_DAY)
+    start = datetime.utcnow().date() - timedelta(days=10)
+    await ensure_time_partitions(client.engine, name, 10, start=start)
+    return collection.table_uri
+
+
+@pytest.mark.anyio
+async def test_expired_partitions_are_dropped(
+    pg_client: PgVectorClient,
+    collection_name: str,
+) -> None:
+    await daily_table(pg_client, collection_name)
+
+    dropped = await drop_expired_partitions(pg_client.engine, collection_name, 3)
+
+    assert sorted(days_old(name) for name in dropped) == [4, 5, 6, 7, 8, 9, 10]
+    remaining = await partitions(pg_client, collection_name)
+    assert max(days_old(name) for name in remaining) == 3
+    assert await drop_expired_partitions(pg_client.engine, collection_name, 3) == []
+
+
+@pytest.mark.anyio
+async def test_run_is_skipped_while_another_worker_holds_the_lock(
+    pg_client: PgVectorClient,
+    collection_name: str,
+) -> None:
+    await daily_table(pg_client, collection_name)
+    before = await partitions(pg_client, collection_name)
+
+    async with pg_client.engine.begin() as conn:
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+            {"name": f"partitions:{collection_name}"},
+        )
+        dropped = await drop_expired_partitions(pg_client.engine, collection_name, 3)
+
+    assert dropped == []
+    assert await partitions(pg_client, collection_name) == before
+
+
+@pytest.mark.anyio
+async def test_pending_detach_is_finalized(
+    pg_client: PgVectorClient,
+    collection_name: str,
+) -> None:
+    table = await daily_table(pg_client, collection_name)
+    oldest = (await partitions(pg_client, collection_name))[0]
+    partition = f"{settings.DB_VECTOR_SCHEMA}.{oldest}"
+
+    # A reader keeps the detach waiting until it times out, half done
+    async with pg_client.engine.connect() as reader:
+        await reader.execute(text(f"SELECT count(*) FROM {table}"))  # noqa: S608
+        async with pg_client.engine.connect() as connection:
+            conn = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("SET statement_timeout = 200"))
+            with pytest.raises(DBAPIError):
+                await conn.execute(
+                    text(
+                        f"ALTER TABLE {table} "
+                        f"DETACH PARTITION {partition} CONCURRENTLY",
+                    ),
+                )
+            await connection.invalidate()
+        await reader.rollback()
+    async with pg_client.engine.connect() as conn:
+        result = await conn.execute(
+            text(LIST_PARTITIONS_DETACH_SQL),
+            {"schema": settings.DB_VECTOR_SCHEMA, "table_name": collection_name},
+        )
+        assert (oldest, True) in result.fetchall()
+
+    dropped = await drop_expired_partitions(pg_client.engine, collection_name, 3)
+
+    assert oldest in dropped
+    remaining = await partitions(pg_client, collection_name)
+    assert max(days_old(name) for name in remaining) == 3
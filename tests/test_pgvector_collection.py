@@ -0,0 +1,166 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+import pytest
+
+from app.db.dependencies import PgVectorClient
+from app.db.models import PgVectorCollection
+from app.db.partitions import PartitionSpec
+
+DIMENSION = 4
+
+POINTS = {
+    "p1": {"source": "a.md", "type": "section", "lang": "en"},
+    "p2": {"source": "a.md", "type": "table", "lang": "vi"},
+    "p3": {"source": "b.md", "type": "section", "lang": "en"},
+    "p4": {"source": "c.md", "type": "table", "lang": "it's"},
+}
+
+PARTITIONS = [
+    None,
+    PartitionSpec(strategy="list", column="source", values=["a.md", "b.md"]),
+    PartitionSpec(strategy="hash", column="source", modulus=4),
+]
+
+FILTERS: List[Dict[str, Any]] = [
+    {"source": {"$eq": "a.md"}},
+    {"source": {"$ne": "a.md"}},
+    {"type": {"$eq": "table"}},
+    {"lang": {"$eq": "it's"}},
+    {"missing": {"$ne": "x"}},
+    {"$and": [{"source": {"$eq": "a.md"}}, {"type": {"$eq": "section"}}]},
+    {"$or": [{"source": {"$eq": "b.md"}}, {"lang": {"$eq": "vi"}}]},
+    {
+        "$or": [
+            {"$and": [{"type": {"$eq": "table"}}, {"lang": {"$ne": "vi"}}]},
+            {"source": {"$eq": "b.md"}},
+        ],
+    },
+]
+
+
+def embedding(index: int) -> List[float]:
+    return [0.1 * index, -0.25, 1.0 / 3, float(index)]
+
+
+async def populated(
+    client: PgVectorClient,
+    name: str,
+    partition_by: Optional[PartitionSpec],
+) -> PgVectorCollection:
+    collection = await client.create_collection(name, DIMENSION, partition_by)
+    await collection.upsert_many(
+        ids=list(POINTS),
+        embeddings=[embedding(i) for i in range(len(POINTS))],
+        payloads=list(POINTS.values()),
+    )
+    return collection
+
+
+@pytest.mark.anyio
+async def test_vectors_round_trip_in_binary(
+    pg_client: PgVectorClient,
+    collection_name: str,
+) -> None:
+    collection = await populated(pg_client, collection_name, None)
+    expected = np.asarray(embedding(1), dtype=np.float32)
+
+    point = await collection.get("p2", primary=True)
+    results = await collection.query(embedding(1), limit=1, primary=True)
+
+    assert isinstance(point.embedding, np.ndarray)
+    assert point.embedding.dtype == np.float32
+    np.testing.assert_array_equal(point.embedding, expected)
+    assert results[0].payload.id == "p2"
+    np.testing.assert_array_equal(results[0].payload.embedding, expected)
+    assert results[0].payload.payload == POINTS["p2"]
+    assert results[0].score == pytest.approx(1.0, abs=1e-6)
+
+
+@pytest.mark.anyio
+async def test_export_returns_float32_vectors(
+    pg_client: PgVectorClient,
+    collection_name: str,
+) -> None:
+    collection = await populated(pg_client, collection_name, None)
+
+    rows = [row async for row in collection.export(include_embedding=True)]
+
+    assert [row["id"] for row in rows] == sorted(POINTS)
+    # Payloads are passed through as JSON text
+    assert orjson.loads(rows[0]["payload"]) == POINTS["p1"]
+    np.testing.assert_array_equal(
+        rows[0]["embedding"],
+        np.asarray(embedding(0), dtype=np.float32),
+    )
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("partition_by", PARTITIONS, ids=["plain", "list", "hash"])
+async def test_upsert_many_updates_existing_points(
+    pg_client: PgVectorClient,
+    collection_name: str,
+    partition_by: Optional[PartitionSpec],
+) -> None:
+    collection = await populated(pg_client, collection_name, partition_by)
+
+    updated = {**POINTS["p1"], "type": "updated"}
+    await collection.upsert_many(
+        ids=["p1", "p5"],
+        embeddings=[embedding(9), embedding(5)],
+        payloads=[updated, {"source": "d.md"}],
+    )
+
+    points = {point.id: point for point in await collection.query_all(primary=True)}
+    assert sorted(points) == ["p1", "p2", "p3", "p4", "p5"]
+    assert points["p1"].payload == updated
+    np.testing.assert_array_equal(
+        points["p1"].embedding,
+        np.asarray(embedding(9), dtype=np.float32),
+    )
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("partition_by", PARTITIONS, ids=["plain", "list", "hash"])
+async def test_filter_compilers_agree(
+    pg_client: PgVectorClient,
+    collection_name: str,
+    partition_by: Optional[PartitionSpec],
+) -> None:
+    """The fast path filters select the same points as the ORM filters."""
+    collection = await populated(pg_client, collection_name, partition_by)
+
+    for filter_dict in FILTERS:
+        fast = set(await collection.find_ids(filter_dict, primary=True))
+        orm = {point.id for point in await collection.find(filter_dict, primary=True)}
+        queried = {
+            result.payload.id
+            for result in await collection.query(
+                embedding(0),
+                limit=len(POINTS),
+                filter_dict=filter_dict,
+                primary=True,
+            )
+        }
+        assert fast == orm == queried, filter_dict
+
+
+@pytest.mark.anyio
+async def test_quoted_identifiers(
+    pg_client: PgVectorClient,
+    collection_name: str,
+) -> None:
+    name = f"{collection_name}_Mixed"
+    collection = await populated(
+        pg_client,
+        name,
+        PartitionSpec(strategy="hash", column="Source", modulus=2),
+    )
+    try:
+        assert await collection.find_ids({"Source": {"$eq": ""}}) == sorted(POINTS)
+        await collection.delete_many(["p1"])
+        assert len(await collection.query(embedding(0), limit=10)) == 3
+    finally:
+        async with pg_client.engine.begin() as conn:
+            await conn.exec_driver_sql(f"DROP TABLE {collection.table_uri}")
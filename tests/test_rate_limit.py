@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from app.core.settings import settings
+from app.utils.rate_limit import is_retryable, retry_delay
+
+
+def response(headers: dict) -> httpx.Response:
+    return httpx.Response(429, headers=headers)
+
+
+def test_retry_after_seconds() -> None:
+    assert retry_delay(0, response({"Retry-After": "3"})) == 3
+
+
+def test_retry_after_http_date() -> None:
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=10)
+
+    delay = retry_delay(0, response({"Retry-After": format_datetime(retry_at)}))
+
+    assert 8 <= delay <= 10
+
+
+def test_retry_after_date_in_the_past() -> None:
+    retry_at = datetime.now(timezone.utc) - timedelta(seconds=10)
+
+    assert retry_delay(0, response({"Retry-After": format_datetime(retry_at)})) == 0
+
+
+def test_retry_after_ms_takes_precedence() -> None:
+    headers = {"retry-after-ms": "250", "Retry-After": "3"}
+
+    assert retry_delay(0, response(headers)) == 0.25
+
+
+def test_invalid_retry_after_ms_falls_back_to_retry_after() -> None:
+    headers = {"retry-after-ms": "soon", "Retry-After": "2"}
+
+    assert retry_delay(0, response(headers)) == 2
+
+
+def test_retry_after_is_capped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "RETRY_MAX_DELAY", 5.0)
+
+    assert retry_delay(0, response({"Retry-After": "120"})) == 5
+
+
+@pytest.mark.parametrize("attempt", [0, 1, 3, 10])
+def test_backoff_without_retry_after(
+    monkeypatch: pytest.MonkeyPatch,
+    attempt: int,
+) -> None:
+    monkeypatch.setattr(settings, "RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(settings, "RETRY_MAX_DELAY", 4.0)
+
+    for headers in ({}, {"Retry-After": "not a date"}):
+        delay = retry_delay(attempt, response(headers))
+        assert 0 <= delay <= min(4.0, 0.5 * 2**attempt)
+    assert 0 <= retry_delay(attempt) <= min(4.0, 0.5 * 2**attempt)
+
+
+def test_retryable_status_codes() -> None:
+    assert is_retryable(429)
+    assert is_retryable(503)
+    assert not is_retryable(400)
@@ -0,0 +1,50 @@
+from typing import Any
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.dependencies import PgVectorClient
+from app.db.routing import read_your_writes
+from app.services.retrieval import RetrievalService
+
+DIMENSION = 4
+
+
+class CountingSessionMaker(async_sessionmaker):
+    """Session maker that counts the sessions it opened."""
+
+    calls = 0
+
+    def __call__(self, **kwargs: Any) -> AsyncSession:
+        self.calls += 1
+        return super().__call__(**kwargs)
+
+
+@pytest.mark.anyio
+async def test_keyword_search_reads_from_replica_unless_pinned(
+    pg_client: PgVectorClient,
+    collection_name: str,
+) -> None:
+    replica = CountingSessionMaker(pg_client.engine, expire_on_commit=False)
+    client = PgVectorClient(
+        pg_client.engine,
+        pg_client.session_maker,
+        read_session_maker=replica,
+    )
+    collection = await client.create_collection(collection_name, DIMENSION)
+    await collection.upsert_many(
+        ids=["p1"],
+        embeddings=[[1.0, 0.0, 0.0, 0.0]],
+        payloads=[{"content": "Refunds need the original receipt."}],
+    )
+    service = RetrievalService(client)
+
+    records = await service.keyword_search("receipt", collection_name)
+    assert [record.content for record in records] == [
+        "Refunds need the original receipt.",
+    ]
+    assert replica.calls == 1
+
+    with read_your_writes():
+        await service.keyword_search("receipt", collection_name)
+    assert replica.calls == 1
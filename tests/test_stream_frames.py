@@ -0,0 +1,107 @@
+import asyncio
+from typing import AsyncGenerator, List, Optional
+
+import pytest
+
+from app.utils.openai_connect import END_OF_STREAM, USAGE_CHAR
+from app.utils.stream_frames import coalesce_chunks
+
+USAGE = {"total_tokens": 3}
+
+
+class Source:
+    """Stream of (is_success, chunk, usage) items, None items are pauses."""
+
+    def __init__(self, items: List[Optional[tuple]], pause: float = 0.05) -> None:
+        self.items = items
+        self.pause = pause
+        self.closed = False
+
+    async def stream(self) -> AsyncGenerator:
+        try:
+            for item in self.items:
+                if item is None:
+                    await asyncio.sleep(self.pause)
+                else:
+                    yield item
+        finally:
+            self.closed = True
+
+
+def tokens(*chunks: str) -> List[tuple]:
+    return [(True, chunk, None) for chunk in chunks]
+
+
+async def collect(frames: AsyncGenerator) -> List[tuple]:
+    return [frame async for frame in frames]
+
+
+@pytest.mark.anyio
+async def test_tokens_are_merged_into_frames() -> None:
+    source = Source(tokens("a", "b", "c", "d"))
+
+    frames = await collect(coalesce_chunks(source.stream(), 100, 10))
+
+    # The first token is flushed right away
+    assert frames == [(True, "a", None), (True, "bcd", None)]
+    assert source.closed
+
+
+@pytest.mark.anyio
+async def test_frame_is_flushed_at_max_chars() -> None:
+    source = Source(tokens("a", "bb", "cc", "dd", "e"))
+
+    frames = await collect(coalesce_chunks(source.stream(), 4, 10))
+
+    assert [chunk for _, chunk, _ in frames] == ["a", "bbcc", "dde"]
+
+
+@pytest.mark.anyio
+async def test_frame_is_flushed_while_waiting_for_tokens() -> None:
+    source = Source([*tokens("a", "b"), None, *tokens("c")], pause=0.2)
+
+    frames = await collect(coalesce_chunks(source.stream(), 100, 0.05))
+
+    assert [chunk for _, chunk, _ in frames] == ["a", "b", "c"]
+
+
+@pytest.mark.anyio
+async def test_markers_and_usage_flush_and_pass_through() -> None:
+    source = Source(
+        [
+            *tokens("a", "b", "c"),
+            (True, USAGE_CHAR, USAGE),
+            (True, END_OF_STREAM, None),
+        ],
+    )
+
+    frames = await collect(coalesce_chunks(source.stream(), 100, 10))
+
+    assert frames == [
+        (True, "a", None),
+        (True, "bc", None),
+        (True, USAGE_CHAR, USAGE),
+        (True, END_OF_STREAM, None),
+    ]
+
+
+@pytest.mark.anyio
+async def test_failure_is_passed_through() -> None:
+    source = Source([*tokens("a", "b"), (False, None, None)])
+
+    frames = await collect(coalesce_chunks(source.stream(), 100, 10))
+
+    assert frames == [(True, "a", None), (True, "b", None), (False, None, None)]
+
+
+@pytest.mark.anyio
+async def test_closing_frames_closes_the_source() -> None:
+    source = Source([*tokens("a", "b"), None, *tokens("c")], pause=10)
+    frames = coalesce_chunks(source.stream(), 100, 0.01)
+
+    assert await frames.__anext__() == (True, "a", None)
+    assert await frames.__anext__() == (True, "b", None)
+    # The next token is pending when the consumer goes away
+    await frames.aclose()
+
+    assert source.closed